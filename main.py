@@ -1,10 +1,20 @@
+import logging
+
 from fastapi import FastAPI, Depends, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.staticfiles import StaticFiles
 from sqlalchemy import text
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from src.conf.config import config
 from src.database.db import get_db
-from src.routes import auth, users, notes
+from src.routes import auth, users, notes, internal, metrics
+from src.services.avatars import avatar_pipeline
+from src.services.change_feed import change_broker
+from src.services.hashing import password_hasher
+from src.services.jobs import job_queue
+
+logger = logging.getLogger(__name__)
 
 app = FastAPI()
 
@@ -18,9 +28,41 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.on_event("startup")
+def start_job_workers():
+    job_queue.start()
+
+
+@app.on_event("shutdown")
+async def stop_job_workers():
+    await job_queue.stop()
+
+
+@app.on_event("shutdown")
+def shutdown_password_hasher():
+    password_hasher.shutdown()
+
+
+@app.on_event("shutdown")
+def shutdown_avatar_pipeline():
+    avatar_pipeline.shutdown()
+
+
+@app.on_event("shutdown")
+async def shutdown_change_broker():
+    await change_broker.close()
+
+
 app.include_router(auth.router, prefix='/api')
 app.include_router(users.router, prefix='/api')
 app.include_router(notes.router, prefix='/api')
+app.include_router(internal.router, prefix='/api')
+
+if config.METRICS_ENABLED:
+    metrics.install(app)
+
+if config.AVATAR_STORAGE == "local":
+    app.mount(config.AVATAR_LOCAL_URL, StaticFiles(directory=config.AVATAR_LOCAL_DIR, check_dir=False), name="avatars")
 
 @app.get("/")
 def index():
@@ -35,6 +77,6 @@ async def healthchecker(db: AsyncSession = Depends(get_db)):
         if result is None:
             raise HTTPException(status_code=500, detail="Database is not configured correctly")
         return {"message": "Welcome to Contacts App!"}
-    except Exception as e:
-        print(e)
+    except Exception:
+        logger.exception("Health check failed")
         raise HTTPException(status_code=500, detail="Error connecting to the database")
\ No newline at end of file
@@ -0,0 +1,53 @@
+"""add note search indexes
+
+Revision ID: 3a9d5c1e7b42
+Revises: fcc4c14b2947
+Create Date: 2026-10-18 10:12:41.208315
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3a9d5c1e7b42'
+down_revision: Union[str, Sequence[str], None] = 'fcc4c14b2947'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    op.add_column('notes', sa.Column(
+        'search_vector',
+        postgresql.TSVECTOR(),
+        sa.Computed("to_tsvector('simple', coalesce(title, '') || ' ' || coalesce(content, ''))", persisted=True),
+        nullable=True,
+    ))
+    # the GIN builds are the slow part; CONCURRENTLY keeps notes writable meanwhile
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_notes_search_vector', 'notes', ['search_vector'],
+            postgresql_using='gin', postgresql_concurrently=True,
+        )
+        op.create_index(
+            'ix_notes_title_trgm', 'notes', ['title'],
+            postgresql_using='gin', postgresql_ops={'title': 'gin_trgm_ops'}, postgresql_concurrently=True,
+        )
+        op.create_index(
+            'ix_notes_content_trgm', 'notes', ['content'],
+            postgresql_using='gin', postgresql_ops={'content': 'gin_trgm_ops'}, postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_notes_content_trgm', table_name='notes', postgresql_concurrently=True)
+        op.drop_index('ix_notes_title_trgm', table_name='notes', postgresql_concurrently=True)
+        op.drop_index('ix_notes_search_vector', table_name='notes', postgresql_concurrently=True)
+    op.drop_column('notes', 'search_vector')
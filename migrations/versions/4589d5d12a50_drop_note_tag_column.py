@@ -0,0 +1,109 @@
+"""drop note tag column
+
+Revision ID: 4589d5d12a50
+Revises: 7e2c4b9d1f36
+Create Date: 2026-10-18 17:48:12.406519
+
+Contract step of a6f0d3b8e571: run once no instance writes notes.tag.
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4589d5d12a50'
+down_revision: Union[str, Sequence[str], None] = '7e2c4b9d1f36'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BATCH_SIZE = 5000
+
+# same as in a6f0d3b8e571, recreated on downgrade
+SYNC_TAG_FUNCTION = """
+CREATE FUNCTION notes_sync_tag() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    IF NEW.user_id IS NULL THEN
+        RETURN NEW;
+    END IF;
+    IF TG_OP = 'INSERT' THEN
+        IF NEW.tag_id IS NULL AND NEW.tag IS NOT NULL THEN
+            INSERT INTO tags (user_id, name) VALUES (NEW.user_id, NEW.tag) ON CONFLICT DO NOTHING;
+            SELECT id INTO NEW.tag_id FROM tags WHERE user_id = NEW.user_id AND name = NEW.tag;
+        ELSIF NEW.tag_id IS NOT NULL THEN
+            SELECT name INTO NEW.tag FROM tags WHERE id = NEW.tag_id;
+        END IF;
+    ELSIF NEW.tag_id IS DISTINCT FROM OLD.tag_id THEN
+        SELECT name INTO NEW.tag FROM tags WHERE id = NEW.tag_id;
+    ELSIF NEW.tag IS DISTINCT FROM OLD.tag AND NEW.tag IS NOT NULL THEN
+        INSERT INTO tags (user_id, name) VALUES (NEW.user_id, NEW.tag) ON CONFLICT DO NOTHING;
+        SELECT id INTO NEW.tag_id FROM tags WHERE user_id = NEW.user_id AND name = NEW.tag;
+    END IF;
+    RETURN NEW;
+END
+$$
+"""
+SYNC_TAG_TRIGGER = (
+    "CREATE TRIGGER notes_sync_tag BEFORE INSERT OR UPDATE OF tag, tag_id ON notes "
+    "FOR EACH ROW EXECUTE FUNCTION notes_sync_tag()"
+)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    connection = op.get_bind()
+    unlinked = connection.execute(sa.text("SELECT count(*) FROM notes WHERE tag_id IS NULL")).scalar()
+    if unlinked:
+        raise RuntimeError(
+            f"{unlinked} notes have no tag_id; notes without a user are never linked, "
+            "delete or assign them before dropping notes.tag"
+        )
+
+    # SET NOT NULL skips its full scan under an exclusive lock when a validated check proves it;
+    # validating only blocks schema changes, not writes
+    op.execute(
+        "ALTER TABLE notes ADD CONSTRAINT notes_tag_id_not_null CHECK (tag_id IS NOT NULL) NOT VALID"
+    )
+    with op.get_context().autocommit_block():
+        op.execute("ALTER TABLE notes VALIDATE CONSTRAINT notes_tag_id_not_null")
+        op.drop_index('ix_notes_user_id_tag_created_at', table_name='notes', postgresql_concurrently=True)
+    op.alter_column('notes', 'tag_id', existing_type=sa.Integer(), nullable=False)
+    op.drop_constraint('notes_tag_id_not_null', 'notes', type_='check')
+
+    op.execute("DROP TRIGGER notes_sync_tag ON notes")
+    op.execute("DROP FUNCTION notes_sync_tag()")
+    op.drop_column('notes', 'tag')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.add_column('notes', sa.Column('tag', sa.String(length=50), nullable=True))
+    op.execute(SYNC_TAG_FUNCTION)
+    op.execute(SYNC_TAG_TRIGGER)
+    op.alter_column('notes', 'tag_id', existing_type=sa.Integer(), nullable=True)
+
+    with op.get_context().autocommit_block():
+        connection = op.get_bind()
+        after = 0
+        while True:
+            upto = connection.execute(
+                sa.text("SELECT max(id) FROM (SELECT id FROM notes WHERE id > :after "
+                        "ORDER BY id LIMIT :batch_size) AS batch"),
+                {"after": after, "batch_size": BATCH_SIZE},
+            ).scalar()
+            if upto is None:
+                break
+            connection.execute(
+                sa.text("UPDATE notes SET tag = tags.name FROM tags "
+                        "WHERE notes.id > :after AND notes.id <= :upto AND notes.tag IS NULL "
+                        "AND tags.id = notes.tag_id"),
+                {"after": after, "upto": upto},
+            )
+            after = upto
+        op.create_index(
+            'ix_notes_user_id_tag_created_at', 'notes',
+            ['user_id', 'tag', sa.text('created_at DESC')],
+            postgresql_concurrently=True,
+        )
@@ -0,0 +1,43 @@
+"""add note counters
+
+Revision ID: 5c2f8e91a0d3
+Revises: b71e04d2c9a8
+Create Date: 2026-10-18 10:54:19.630412
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5c2f8e91a0d3'
+down_revision: Union[str, Sequence[str], None] = 'b71e04d2c9a8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('note_counters',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('tag', sa.String(length=50), nullable=False),
+    sa.Column('count', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('user_id', 'tag')
+    )
+    op.execute(
+        "INSERT INTO note_counters (user_id, tag, count) "
+        "SELECT user_id, '', count(*) FROM notes WHERE user_id IS NOT NULL GROUP BY user_id"
+    )
+    op.execute(
+        "INSERT INTO note_counters (user_id, tag, count) "
+        "SELECT user_id, tag, count(*) FROM notes "
+        "WHERE user_id IS NOT NULL AND tag <> '' GROUP BY user_id, tag"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('note_counters')
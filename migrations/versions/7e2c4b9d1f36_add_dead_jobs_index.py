@@ -0,0 +1,28 @@
+"""add dead jobs index
+
+Revision ID: 7e2c4b9d1f36
+Revises: 9b3d5f7a1c48
+Create Date: 2026-10-18 19:12:40.218337
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7e2c4b9d1f36'
+down_revision: Union[str, Sequence[str], None] = '9b3d5f7a1c48'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_jobs_dead_kind', 'jobs', ['kind'], unique=False, postgresql_where=sa.text("status = 'dead'"))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_jobs_dead_kind', table_name='jobs', postgresql_where=sa.text("status = 'dead'"))
@@ -0,0 +1,28 @@
+"""add note version
+
+Revision ID: 8d4a1f6b3e25
+Revises: 5c2f8e91a0d3
+Create Date: 2026-10-18 12:02:44.917530
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8d4a1f6b3e25'
+down_revision: Union[str, Sequence[str], None] = '5c2f8e91a0d3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('notes', sa.Column('version', sa.Integer(), server_default='1', nullable=False))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('notes', 'version')
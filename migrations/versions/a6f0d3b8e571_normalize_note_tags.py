@@ -0,0 +1,156 @@
+"""normalize note tags
+
+Revision ID: a6f0d3b8e571
+Revises: e3b9c7a2d614
+Create Date: 2026-10-18 13:26:51.774093
+
+Expand and backfill only: notes.tag stays, kept in sync with tag_id by a
+trigger so app instances of either version can write while this runs.
+Revision 4589d5d12a50, the last one, drops it once no old instances are
+left, so for a rolling deploy upgrade to the revision before it
+(7e2c4b9d1f36), roll out, then upgrade to head.
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a6f0d3b8e571'
+down_revision: Union[str, Sequence[str], None] = 'e3b9c7a2d614'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BATCH_SIZE = 5000
+
+# old instances write only tag, new ones only tag_id; fill in the other
+SYNC_TAG_FUNCTION = """
+CREATE FUNCTION notes_sync_tag() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    IF NEW.user_id IS NULL THEN
+        RETURN NEW;
+    END IF;
+    IF TG_OP = 'INSERT' THEN
+        IF NEW.tag_id IS NULL AND NEW.tag IS NOT NULL THEN
+            INSERT INTO tags (user_id, name) VALUES (NEW.user_id, NEW.tag) ON CONFLICT DO NOTHING;
+            SELECT id INTO NEW.tag_id FROM tags WHERE user_id = NEW.user_id AND name = NEW.tag;
+        ELSIF NEW.tag_id IS NOT NULL THEN
+            SELECT name INTO NEW.tag FROM tags WHERE id = NEW.tag_id;
+        END IF;
+    ELSIF NEW.tag_id IS DISTINCT FROM OLD.tag_id THEN
+        SELECT name INTO NEW.tag FROM tags WHERE id = NEW.tag_id;
+    ELSIF NEW.tag IS DISTINCT FROM OLD.tag AND NEW.tag IS NOT NULL THEN
+        INSERT INTO tags (user_id, name) VALUES (NEW.user_id, NEW.tag) ON CONFLICT DO NOTHING;
+        SELECT id INTO NEW.tag_id FROM tags WHERE user_id = NEW.user_id AND name = NEW.tag;
+    END IF;
+    RETURN NEW;
+END
+$$
+"""
+SYNC_TAG_TRIGGER = (
+    "CREATE TRIGGER notes_sync_tag BEFORE INSERT OR UPDATE OF tag, tag_id ON notes "
+    "FOR EACH ROW EXECUTE FUNCTION notes_sync_tag()"
+)
+
+# one batch of notes by id range: create its missing tags, then link them; each
+# statement commits on its own so notes is never locked for long
+INSERT_BATCH_TAGS = (
+    "INSERT INTO tags (user_id, name) "
+    "SELECT DISTINCT user_id, tag FROM notes "
+    "WHERE id > :after AND id <= :upto AND tag_id IS NULL AND user_id IS NOT NULL AND tag IS NOT NULL "
+    "ON CONFLICT DO NOTHING"
+)
+LINK_BATCH_TAGS = (
+    "UPDATE notes SET tag_id = tags.id FROM tags "
+    "WHERE notes.id > :after AND notes.id <= :upto AND notes.tag_id IS NULL "
+    "AND tags.user_id = notes.user_id AND tags.name = notes.tag"
+)
+
+
+def _batch_bounds(connection, where: str):
+    """Yield (after, upto) id ranges of BATCH_SIZE notes matching `where`, walking the primary key."""
+    after = 0
+    while True:
+        upto = connection.execute(
+            sa.text(f"SELECT max(id) FROM (SELECT id FROM notes WHERE id > :after AND {where} "
+                    "ORDER BY id LIMIT :batch_size) AS batch"),
+            {"after": after, "batch_size": BATCH_SIZE},
+        ).scalar()
+        if upto is None:
+            return
+        yield after, upto
+        after = upto
+
+
+def _count(connection, where: str) -> int:
+    return connection.execute(sa.text(f"SELECT count(*) FROM notes WHERE {where}")).scalar()
+
+
+def _backfill_tag_ids(connection) -> None:
+    """Link every note to its tag in batches.
+
+    Passes repeat until no note is left unlinked, in case an old instance
+    changed a tag between a batch's two statements; the trigger covers
+    notes written meanwhile.
+    """
+    missing = "tag_id IS NULL AND user_id IS NOT NULL AND tag IS NOT NULL"
+    remaining = _count(connection, missing)
+    while remaining:
+        for after, upto in _batch_bounds(connection, missing):
+            bounds = {"after": after, "upto": upto}
+            connection.execute(sa.text(INSERT_BATCH_TAGS), bounds)
+            connection.execute(sa.text(LINK_BATCH_TAGS), bounds)
+        left = _count(connection, missing)
+        if left >= remaining:
+            raise RuntimeError(f"Backfilling notes.tag_id made no progress, {left} notes left")
+        remaining = left
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('tags',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(length=50), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('user_id', 'name', name='uq_tags_user_id_name')
+    )
+    op.add_column('notes', sa.Column('tag_id', sa.Integer(), nullable=True))
+    # NOT VALID skips checking existing rows under lock; validated after the backfill
+    op.execute(
+        "ALTER TABLE notes ADD CONSTRAINT notes_tag_id_fkey "
+        "FOREIGN KEY (tag_id) REFERENCES tags (id) NOT VALID"
+    )
+    # new instances don't write it, the trigger does
+    op.alter_column('notes', 'tag', existing_type=sa.String(length=50), nullable=True)
+    op.execute(SYNC_TAG_FUNCTION)
+    op.execute(SYNC_TAG_TRIGGER)
+
+    with op.get_context().autocommit_block():
+        connection = op.get_bind()
+        _backfill_tag_ids(connection)
+        op.execute("ALTER TABLE notes VALIDATE CONSTRAINT notes_tag_id_fkey")
+        op.create_index(
+            'ix_notes_user_id_tag_id_created_at', 'notes',
+            ['user_id', 'tag_id', sa.text('created_at DESC')],
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            'ix_notes_user_id_tag_id_created_at', table_name='notes', postgresql_concurrently=True,
+        )
+    op.execute("DROP TRIGGER notes_sync_tag ON notes")
+    op.execute("DROP FUNCTION notes_sync_tag()")
+    # the trigger kept tag filled; only notes without a user can lack one
+    op.execute("UPDATE notes SET tag = '' WHERE tag IS NULL")
+    op.alter_column('notes', 'tag', existing_type=sa.String(length=50), nullable=False)
+    op.drop_constraint('notes_tag_id_fkey', 'notes', type_='foreignkey')
+    op.drop_column('notes', 'tag_id')
+    op.drop_table('tags')
@@ -0,0 +1,41 @@
+"""add note access path indexes
+
+Revision ID: b71e04d2c9a8
+Revises: 3a9d5c1e7b42
+Create Date: 2026-10-18 10:31:07.551902
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b71e04d2c9a8'
+down_revision: Union[str, Sequence[str], None] = '3a9d5c1e7b42'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # CONCURRENTLY keeps notes writable during the build; it can't run in a transaction
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_notes_user_id_created_at_id', 'notes',
+            ['user_id', sa.text('created_at DESC'), sa.text('id DESC')],
+            postgresql_concurrently=True,
+        )
+        op.create_index(
+            'ix_notes_user_id_tag_created_at', 'notes',
+            ['user_id', 'tag', sa.text('created_at DESC')],
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_notes_user_id_tag_created_at', table_name='notes', postgresql_concurrently=True)
+        op.drop_index('ix_notes_user_id_created_at_id', table_name='notes', postgresql_concurrently=True)
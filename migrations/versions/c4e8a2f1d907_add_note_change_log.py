@@ -0,0 +1,38 @@
+"""add note change log
+
+Revision ID: c4e8a2f1d907
+Revises: a6f0d3b8e571
+Create Date: 2026-10-18 15:02:41.118204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c4e8a2f1d907'
+down_revision: Union[str, Sequence[str], None] = 'a6f0d3b8e571'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('notes', sa.Column('change_seq', sa.Integer(), server_default='0', nullable=False))
+    op.create_index('ix_notes_user_id_change_seq_id', 'notes', ['user_id', 'change_seq', 'id'], unique=False)
+    op.create_table('note_tombstones',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('change_seq', sa.Integer(), nullable=False),
+    sa.Column('note_id', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('user_id', 'change_seq', 'note_id')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('note_tombstones')
+    op.drop_index('ix_notes_user_id_change_seq_id', table_name='notes')
+    op.drop_column('notes', 'change_seq')
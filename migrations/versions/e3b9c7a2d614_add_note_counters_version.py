@@ -0,0 +1,28 @@
+"""add note counters version
+
+Revision ID: e3b9c7a2d614
+Revises: 8d4a1f6b3e25
+Create Date: 2026-10-18 12:40:15.302846
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e3b9c7a2d614'
+down_revision: Union[str, Sequence[str], None] = '8d4a1f6b3e25'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('note_counters', sa.Column('version', sa.Integer(), server_default='0', nullable=False))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('note_counters', 'version')
@@ -0,0 +1,17 @@
+"""Delete expired refresh-token sessions in batches; meant for cron.
+
+Usage: python -m src.commands.cleanup_sessions
+"""
+import asyncio
+
+from src.database.db import SessionLocal
+from src.services.sessions import delete_expired_sessions
+
+
+async def main():
+    async with SessionLocal() as session:
+        print(await delete_expired_sessions(session))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,17 @@
+"""Rebuild note_counters from scratch.
+
+Usage: python -m src.commands.rebuild_note_counters
+"""
+import asyncio
+
+from src.database.db import SessionLocal
+from src.repository.counters import rebuild_note_counters
+
+
+async def main():
+    async with SessionLocal() as session:
+        await rebuild_note_counters(session)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,18 @@
+"""Move dead jobs back to pending with a fresh set of attempts.
+
+Usage: python -m src.commands.requeue_dead_jobs [kind]
+"""
+import asyncio
+import sys
+
+from src.database.db import SessionLocal
+from src.services.jobs import requeue_dead_jobs
+
+
+async def main(kind=None):
+    async with SessionLocal() as session:
+        print(await requeue_dead_jobs(session, kind))
+
+
+if __name__ == "__main__":
+    asyncio.run(main(*sys.argv[1:2]))
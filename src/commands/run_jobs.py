@@ -0,0 +1,22 @@
+"""Run background jobs outside the API process.
+
+Usage: python -m src.commands.run_jobs
+"""
+import asyncio
+
+# importing these registers their job handlers
+import src.repository.users  # noqa: F401
+import src.services.avatars  # noqa: F401
+from src.services.jobs import job_queue
+
+
+async def main():
+    job_queue.start()
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await job_queue.stop()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
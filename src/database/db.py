@@ -1,10 +1,63 @@
-from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
-from src.conf.config import DB_URL
+from uuid import uuid4
 
-engine = create_async_engine(DB_URL)
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
+from src.conf.config import config
 
-SessionLocal = async_sessionmaker(bind=engine, autocommit=False, autoflush=False)
+
+def _engine_kwargs(url: str) -> dict:
+    kwargs = {
+        "pool_size": config.DB_POOL_SIZE,
+        "max_overflow": config.DB_MAX_OVERFLOW,
+        "pool_timeout": config.DB_POOL_TIMEOUT,
+        "pool_recycle": config.DB_POOL_RECYCLE,
+        "pool_pre_ping": config.DB_POOL_PRE_PING,
+    }
+    if "+asyncpg" in url:
+        if config.DB_PGBOUNCER:
+            # transaction pooling hands each transaction a different server
+            # connection, so named prepared statements can't be reused
+            kwargs["connect_args"] = {
+                "statement_cache_size": 0,
+                "prepared_statement_cache_size": 0,
+                "prepared_statement_name_func": lambda: f"__asyncpg_{uuid4()}__",
+            }
+        else:
+            kwargs["connect_args"] = {
+                "statement_cache_size": config.DB_STATEMENT_CACHE_SIZE,
+                "prepared_statement_cache_size": config.DB_STATEMENT_CACHE_SIZE,
+            }
+        # timestamps are naive columns filled by now(); keep them in UTC whatever the server's zone
+        kwargs["connect_args"]["server_settings"] = {"timezone": "UTC"}
+    return kwargs
+
+
+def make_engine(url: str) -> AsyncEngine:
+    return create_async_engine(url, **_engine_kwargs(url))
+
+
+def pool_status(engine: AsyncEngine) -> dict:
+    pool = engine.pool
+    return {
+        "size": pool.size(),
+        "checkedOut": pool.checkedout(),
+        "idle": pool.checkedin(),
+        # negative while the pool hasn't opened pool_size connections yet
+        "overflow": max(pool.overflow(), 0),
+        "maxOverflow": config.DB_MAX_OVERFLOW,
+    }
+
+
+def dialect_insert(db: AsyncSession):
+    """insert() for the session's dialect, which supports on_conflict_*."""
+    return pg_insert if db.get_bind().dialect.name == "postgresql" else sqlite_insert
+
+
+engine = make_engine(config.DB_URL)
+
+SessionLocal = async_sessionmaker(bind=engine, autocommit=False, autoflush=False, expire_on_commit=False)
 
 async def get_db():
     async with SessionLocal() as session:
-        yield session
\ No newline at end of file
+        yield session
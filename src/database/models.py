@@ -1,11 +1,23 @@
-from sqlalchemy import Column, Integer, String, Boolean, func, Table, UniqueConstraint
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Computed, Integer, String, Boolean, func, Table, UniqueConstraint, Index, JSON, Text, text
+from sqlalchemy.dialects.postgresql import TSVECTOR
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.orm import deferred, relationship
+from sqlalchemy.schema import CreateColumn
 from sqlalchemy.sql.schema import ForeignKey
 from sqlalchemy.sql.sqltypes import DateTime
 from sqlalchemy.ext.declarative import declarative_base
 
 Base = declarative_base()
 
+
+@compiles(CreateColumn, "sqlite")
+def _skip_postgresql_only_columns(element, compiler, **kw):
+    # SQLite (tests) has no tsvector; the repository only reads these columns on Postgres
+    if element.element.info.get("postgresql_only"):
+        return None
+    return compiler.visit_create_column(element, **kw)
+
+
 class Note(Base):
     __tablename__ = "notes"
     id = Column(Integer, primary_key=True)
@@ -13,9 +25,90 @@ class Note(Base):
     created_at = Column('created_at', DateTime, default=func.now())
     updated_at = Column('updated_at', DateTime, default=func.now())
     content = Column(String(150), nullable=False)
-    tag = Column(String(50), nullable=False)
+    tag_id = Column('tag_id', ForeignKey('tags.id'), nullable=False)
+    version = Column(Integer, nullable=False, default=1, server_default="1")
+    # user's notes version at the last write, see repository.counters.begin_note_write
+    change_seq = Column(Integer, nullable=False, default=0, server_default="0")
     user_id = Column('user_id', ForeignKey('users.id', ondelete='CASCADE'), default=None)
     user = relationship('User', backref="notes")
+    # maintained by Postgres for fulltext search; deferred so loading a note doesn't fetch it
+    search_vector = deferred(Column(
+        TSVECTOR,
+        Computed("to_tsvector('simple', coalesce(title, '') || ' ' || coalesce(content, ''))", persisted=True),
+        info={"postgresql_only": True},
+    ))
+    # tag name for the API; not a column, the repository fills it in from tags.name
+    tag = None
+
+    __table_args__ = (
+        Index("ix_notes_user_id_created_at_id", user_id, created_at.desc(), id.desc()),
+        Index("ix_notes_user_id_tag_id_created_at", user_id, tag_id, created_at.desc()),
+        Index("ix_notes_user_id_change_seq_id", user_id, change_seq, id),
+        Index("ix_notes_search_vector", "search_vector", postgresql_using="gin").ddl_if(dialect="postgresql"),
+        Index(
+            "ix_notes_title_trgm", title, postgresql_using="gin", postgresql_ops={"title": "gin_trgm_ops"}
+        ).ddl_if(dialect="postgresql"),
+        Index(
+            "ix_notes_content_trgm", content, postgresql_using="gin", postgresql_ops={"content": "gin_trgm_ops"}
+        ).ddl_if(dialect="postgresql"),
+    )
+
+class NoteTombstone(Base):
+    __tablename__ = "note_tombstones"
+    user_id = Column('user_id', ForeignKey('users.id', ondelete='CASCADE'), primary_key=True)
+    change_seq = Column(Integer, primary_key=True)
+    note_id = Column(Integer, primary_key=True)
+
+class Tag(Base):
+    __tablename__ = "tags"
+    id = Column(Integer, primary_key=True)
+    user_id = Column('user_id', ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
+    name = Column(String(50), nullable=False)
+
+    __table_args__ = (
+        UniqueConstraint("user_id", "name", name="uq_tags_user_id_name"),
+    )
+
+class NoteCounter(Base):
+    __tablename__ = "note_counters"
+    user_id = Column('user_id', ForeignKey('users.id', ondelete='CASCADE'), primary_key=True)
+    tag = Column(String(50), primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
+    version = Column(Integer, nullable=False, default=1, server_default="0")
+
+class Job(Base):
+    __tablename__ = "jobs"
+    id = Column(Integer, primary_key=True)
+    kind = Column(String(50), nullable=False)
+    payload = Column(JSON, nullable=False)
+    # 'pending' or 'dead'; finished jobs are deleted
+    status = Column(String(10), nullable=False, default="pending", server_default="pending")
+    attempts = Column(Integer, nullable=False, default=0, server_default="0")
+    max_attempts = Column(Integer, nullable=False)
+    # when the job is due; a claim moves it forward by the lease
+    run_at = Column(DateTime, nullable=False, default=func.now(), server_default=func.now())
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=func.now())
+
+    __table_args__ = (
+        Index("ix_jobs_pending_run_at", run_at, postgresql_where=text("status = 'pending'")),
+        Index("ix_jobs_dead_kind", kind, postgresql_where=text("status = 'dead'")),
+    )
+
+class UserSession(Base):
+    __tablename__ = "sessions"
+    # digests of the session id and of the current token id, see services.sessions
+    id = Column(String(64), primary_key=True)
+    user_id = Column('user_id', ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
+    token_hash = Column(String(64), nullable=False)
+    device = Column(String(255), nullable=True)
+    created_at = Column(DateTime, default=func.now())
+    expires_at = Column(DateTime, nullable=False)
+
+    __table_args__ = (
+        Index("ix_sessions_user_id", user_id),
+        Index("ix_sessions_expires_at", expires_at),
+    )
 
 class User(Base):
     __tablename__ = "users"
@@ -25,7 +118,6 @@ class User(Base):
     password = Column(String(255), nullable=False)
     created_at = Column('crated_at', DateTime, default=func.now())
     avatar = Column(String(255), nullable=True)
-    refresh_token = Column(String(255), nullable=True)
 
 
 
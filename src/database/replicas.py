@@ -0,0 +1,118 @@
+import itertools
+import math
+import time
+from contextlib import asynccontextmanager
+
+from fastapi import Request, Response
+from starlette.requests import HTTPConnection
+from sqlalchemy.exc import DBAPIError, InterfaceError, OperationalError
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from src.conf.config import config
+from src.database.db import SessionLocal, make_engine
+
+# set by writes; until the unix time it holds, the client's reads go to the primary
+READ_PRIMARY_COOKIE = "readPrimaryUntil"
+
+
+class ReplicaRouter:
+    """Round-robins reads over healthy replicas.
+
+    A client that wrote within the last `sticky_seconds` reads from the
+    primary so it sees its own writes despite replication lag; a cookie
+    carries that, so it holds whichever worker serves the next request.
+    A replica that can't be connected to is skipped for `retry_after`
+    seconds, and the read goes to another replica or the primary.
+    """
+
+    def __init__(self, urls: list[str], sticky_seconds: float, retry_after: float):
+        self.engines = [make_engine(url) for url in urls]
+        self.sessions = [
+            async_sessionmaker(bind=engine, autocommit=False, autoflush=False, expire_on_commit=False) for engine in self.engines
+        ]
+        self.sticky_seconds = sticky_seconds
+        self.retry_after = retry_after
+        self._down_until = [0.0] * len(self.engines)
+        self._next = itertools.cycle(range(len(self.engines)))
+
+    def pick(self, primary: bool = False) -> int | None:
+        if not self.engines or primary:
+            return None
+        now = time.monotonic()
+        for _ in range(len(self.engines)):
+            index = next(self._next)
+            if self._down_until[index] <= now:
+                return index
+        return None
+
+    def mark_unhealthy(self, index: int) -> None:
+        self._down_until[index] = time.monotonic() + self.retry_after
+
+
+replica_router = ReplicaRouter(
+    config.DB_REPLICA_URLS,
+    sticky_seconds=config.DB_REPLICA_STICKY_SECONDS,
+    retry_after=config.DB_REPLICA_RETRY_AFTER,
+)
+
+
+def reads_primary(request: HTTPConnection) -> bool:
+    """Whether the client wrote recently enough that a replica may not have the write yet."""
+    try:
+        return float(request.cookies.get(READ_PRIMARY_COOKIE, 0)) > time.time()
+    except ValueError:
+        return False
+
+
+async def _connect_replica(primary: bool):
+    """A session already connected to a replica, with its index; (None, None) when none answers."""
+    while (index := replica_router.pick(primary)) is not None:
+        session = replica_router.sessions[index]()
+        try:
+            await session.connection()
+            return session, index
+        except (DBAPIError, OSError):
+            replica_router.mark_unhealthy(index)
+            await session.close()
+    return None, None
+
+
+@asynccontextmanager
+async def read_session(primary: bool = False):
+    """A replica session when one is reachable and `primary` isn't set, else a primary session."""
+    session, index = await _connect_replica(primary)
+    if session is None:
+        async with SessionLocal() as session:
+            yield session
+        return
+
+    async with session:
+        try:
+            yield session
+        except (DBAPIError, OSError) as err:
+            # too late to switch to the primary, but spare the next requests
+            if isinstance(err, (OSError, InterfaceError, OperationalError)) or err.connection_invalidated:
+                replica_router.mark_unhealthy(index)
+            raise
+
+
+async def get_read_db(request: Request):
+    """Session for read-only handlers."""
+    async with read_session(reads_primary(request)) as session:
+        yield session
+
+
+async def get_write_db(response: Response):
+    """Primary session for mutating handlers; pins the caller's reads to the primary."""
+    if replica_router.engines and replica_router.sticky_seconds > 0:
+        response.set_cookie(
+            key=READ_PRIMARY_COOKIE,
+            value=str(math.ceil(time.time() + replica_router.sticky_seconds)),
+            httponly=True,
+            max_age=math.ceil(replica_router.sticky_seconds),
+            samesite="lax",
+            secure=False,
+            path="/",
+        )
+    async with SessionLocal() as session:
+        yield session
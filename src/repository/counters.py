@@ -0,0 +1,106 @@
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import select, delete, insert, func, literal, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.database.db import dialect_insert
+from src.database.models import Note, NoteCounter, Tag, User
+
+# The per-user total is stored under the empty tag. Notes whose tag is itself
+# empty can't be filtered by tag anyway, so they only count towards the total.
+ALL_TAGS = ""
+
+
+async def begin_note_write(db: AsyncSession, user_id: int) -> int:
+    """Bump the user's notes version and return the new value.
+
+    Every note write calls this first. The row lock it takes serializes a
+    user's writes until commit, so the version doubles as a commit-ordered
+    change sequence (notes.change_seq) as well as the ETag stamp.
+    """
+    stmt = dialect_insert(db)(NoteCounter).values(user_id=user_id, tag=ALL_TAGS, count=0, version=1)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[NoteCounter.user_id, NoteCounter.tag],
+        set_={"version": NoteCounter.version + 1},
+    ).returning(NoteCounter.version)
+    return (await db.execute(stmt)).scalar_one()
+
+
+async def bump_note_counters(db: AsyncSession, user_id: int, tag: str, delta: int) -> None:
+    """Adjust the user total and the tag counter in the caller's transaction."""
+    await bump_tag_counters(db, user_id, {tag: delta})
+
+
+async def bump_tag_counters(db: AsyncSession, user_id: int, deltas: Dict[str, int]) -> None:
+    """Apply per-tag deltas, and their sum to the user total, in one statement."""
+    totals = {tag: delta for tag, delta in deltas.items() if tag != ALL_TAGS and delta}
+    if sum(deltas.values()):
+        totals[ALL_TAGS] = sum(deltas.values())
+    if not totals:
+        return
+    # fixed key order keeps row lock order consistent across transactions
+    stmt = dialect_insert(db)(NoteCounter).values(
+        [{"user_id": user_id, "tag": key, "count": totals[key]} for key in sorted(totals)]
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[NoteCounter.user_id, NoteCounter.tag],
+        set_={"count": NoteCounter.count + stmt.excluded.count},
+    )
+    await db.execute(stmt)
+
+
+async def get_note_count(db: AsyncSession, user_id: int, tag: Optional[str] = None) -> int:
+    stmt = select(NoteCounter.count).where(
+        NoteCounter.user_id == user_id, NoteCounter.tag == (tag or ALL_TAGS)
+    )
+    count = (await db.execute(stmt)).scalar_one_or_none()
+    return count or 0
+
+
+async def get_tag_counts(db: AsyncSession, user_id: int) -> List[Tuple[str, int]]:
+    stmt = (
+        select(NoteCounter.tag, NoteCounter.count)
+        .where(NoteCounter.user_id == user_id, NoteCounter.tag != ALL_TAGS, NoteCounter.count > 0)
+        .order_by(NoteCounter.tag)
+    )
+    return [tuple(row) for row in (await db.execute(stmt)).all()]
+
+
+async def get_notes_version(db: AsyncSession, user_id: int) -> int:
+    stmt = select(NoteCounter.version).where(
+        NoteCounter.user_id == user_id, NoteCounter.tag == ALL_TAGS
+    )
+    version = (await db.execute(stmt)).scalar_one_or_none()
+    return version or 0
+
+
+async def rebuild_note_counters(db: AsyncSession) -> None:
+    """Recompute every counter from the notes table in one transaction."""
+    if db.get_bind().dialect.name == "postgresql":
+        # block note writes until the rebuild commits so no bump is lost; writers
+        # lock note_counters before notes, so take the locks in the same order
+        await db.execute(text("LOCK TABLE note_counters, notes IN SHARE ROW EXCLUSIVE MODE"))
+
+    # new versions start above every old one so no previously issued ETag or
+    # change token can match, and every user keeps a total row so they never restart
+    version = (await db.execute(select(func.coalesce(func.max(NoteCounter.version), 0) + 1))).scalar_one()
+
+    await db.execute(delete(NoteCounter))
+    await db.execute(
+        insert(NoteCounter).from_select(
+            ["user_id", "tag", "count", "version"],
+            select(User.id, literal(ALL_TAGS), func.count(Note.id), literal(version))
+            .outerjoin(Note, Note.user_id == User.id)
+            .group_by(User.id),
+        )
+    )
+    await db.execute(
+        insert(NoteCounter).from_select(
+            ["user_id", "tag", "count", "version"],
+            select(Note.user_id, Tag.name, func.count(), literal(version))
+            .join(Tag, Tag.id == Note.tag_id)
+            .where(Note.user_id.is_not(None), Tag.name != ALL_TAGS)
+            .group_by(Note.user_id, Tag.name),
+        )
+    )
+    await db.commit()
@@ -1,104 +1,516 @@
+import base64
+import json
+import re
+from collections import Counter
+from datetime import datetime, timedelta
 from typing import List, Optional, Tuple
 
-from sqlalchemy import and_, select, func, or_
+from sqlalchemy import and_, select, func, insert, delete, update, or_, tuple_
+from sqlalchemy.engine import Row
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from src.database.models import Note, User
-from src.schemas import NoteSchema, NoteResponseSchema
+from src.database.models import Note, NoteTombstone, Tag, User
+from src.repository import counters as repository_counters
+from src.repository import tags as repository_tags
+from src.schemas import NoteSchema, NoteResponseSchema, NotePatchSchema, NoteUpdateSchema
+from src.services.change_feed import change_broker, change_event
 
-async def get_notes_page(
+TS_CONFIG = "simple"
+# columns of NoteResponseSchema; list queries join tags and return plain rows of these
+NOTE_COLUMNS = (
+    Note.id, Note.title, Note.content, Tag.name.label("tag"), Note.created_at, Note.updated_at, Note.version
+)
+# correlated tag name, for RETURNING clauses
+tag_name = select(Tag.name).where(Tag.id == Note.tag_id).correlate(Note).scalar_subquery()
+
+
+def _with_tag(row) -> Note | None:
+    """Attach the tag name from a (Note, tag name) row to the note."""
+    if row is None:
+        return None
+    note, name = row
+    note.tag = name
+    return note
+
+
+def encode_cursor(note: Note | Row, direction: str = "next") -> str:
+    raw = json.dumps([direction, note.created_at.isoformat(), note.id])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[str, datetime, int]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        direction, created_at, note_id = json.loads(base64.urlsafe_b64decode(padded))
+        if direction not in ("next", "prev"):
+            raise ValueError(direction)
+        return direction, datetime.fromisoformat(created_at), int(note_id)
+    except (ValueError, TypeError) as err:
+        raise ValueError("Invalid cursor") from err
+
+
+def _ilike_any(term: str):
+    like = "%" + re.sub(r"([\\%_])", r"\\\1", term) + "%"
+    return or_(Note.title.ilike(like, escape="\\"), Note.content.ilike(like, escape="\\"))
+
+
+def _search_clause(db: AsyncSession, search: str, search_mode: str):
+    """Return (where clause, rank expression) for the given search mode.
+
+    On PostgreSQL fulltext/prefix go through the GIN-indexed tsvector and
+    substring through the trigram indexes. Other dialects (SQLite in tests)
+    fall back to ILIKE on every search term, without ranking.
+    """
+    if search_mode == "substring":
+        return _ilike_any(search), None
+
+    terms = re.findall(r"\w+", search)
+    if not terms:
+        return None, None
+
+    if db.get_bind().dialect.name != "postgresql":
+        return and_(*[_ilike_any(term) for term in terms]), None
+
+    if search_mode == "prefix":
+        query = func.to_tsquery(TS_CONFIG, " & ".join(f"{term}:*" for term in terms))
+    else:
+        query = func.websearch_to_tsquery(TS_CONFIG, search)
+    return Note.search_vector.op("@@")(query), func.ts_rank(Note.search_vector, query)
+
+
+def is_ranked(db: AsyncSession, search: str, search_mode: str) -> bool:
+    """Whether results are ordered by relevance, which (created_at, id) cursors can't page through."""
+    return bool(search) and _search_clause(db, search, search_mode)[1] is not None
+
+
+def _note_filters(
     db: AsyncSession,
     user: User,
-    page: int,
-    per_page: int,
     search: str = "",
     tag: Optional[str] = None,
-) -> Tuple[List[Note], int]:
-
+    search_mode: str = "substring",
+):
     base_filters = [Note.user_id == user.id]
+    rank = None
 
     if tag:
-        base_filters.append(Note.tag == tag)
+        tag_id = select(Tag.id).where(Tag.user_id == user.id, Tag.name == tag).scalar_subquery()
+        base_filters.append(Note.tag_id == tag_id)
 
     if search:
-        like = f"%{search}%"
-        base_filters.append(
-            or_(Note.title.ilike(like), Note.content.ilike(like))
-        )
+        clause, rank = _search_clause(db, search, search_mode)
+        if clause is not None:
+            base_filters.append(clause)
+    return base_filters, rank
 
-    count_stmt = select(func.count()).select_from(Note).where(*base_filters)
-    total: int = (await db.execute(count_stmt)).scalar_one()
+
+async def get_notes_page(
+    db: AsyncSession,
+    user: User,
+    page: int,
+    per_page: int,
+    search: str = "",
+    tag: Optional[str] = None,
+    search_mode: str = "substring",
+) -> Tuple[List[Row], int]:
+
+    base_filters, rank = _note_filters(db, user, search, tag, search_mode)
+
+    if search:
+        count_stmt = select(func.count()).select_from(Note).where(*base_filters)
+        total: int = (await db.execute(count_stmt)).scalar_one()
+    else:
+        total = await repository_counters.get_note_count(db, user.id, tag)
 
     offset = (page - 1) * per_page
+    ordering = [Note.created_at.desc(), Note.id.desc()]
+    if rank is not None:
+        ordering.insert(0, rank.desc())
 
     data_stmt = (
-        select(Note)
+        select(*NOTE_COLUMNS)
+        .join(Tag, Tag.id == Note.tag_id)
         .where(*base_filters)
-        .order_by(Note.created_at.desc())
+        .order_by(*ordering)
         .offset(offset)
         .limit(per_page)
     )
     result = await db.execute(data_stmt)
-    notes = result.scalars().all()
+    notes = result.all()
 
     total_pages = (total + per_page - 1) // per_page if per_page > 0 else 1
     return notes, total_pages
 
 
+async def get_tag_counts(
+    db: AsyncSession,
+    user: User,
+    search: str = "",
+    search_mode: str = "substring",
+) -> List[Tuple[str, int]]:
+    """(tag, count) pairs for the user's notes, optionally restricted by a search."""
+    if not search:
+        return await repository_counters.get_tag_counts(db, user.id)
+
+    filters, _ = _note_filters(db, user, search, None, search_mode)
+    stmt = (
+        select(Tag.name, func.count())
+        .select_from(Note)
+        .join(Tag, Tag.id == Note.tag_id)
+        .where(*filters)
+        .group_by(Tag.name)
+        .order_by(Tag.name)
+    )
+    return [tuple(row) for row in (await db.execute(stmt)).all()]
+
+
+async def get_notes_by_cursor(
+    db: AsyncSession,
+    user: User,
+    per_page: int,
+    cursor: str,
+    search: str = "",
+    tag: Optional[str] = None,
+    search_mode: str = "substring",
+) -> Tuple[List[Row], Optional[str], Optional[str]]:
+    """Keyset page on (created_at, id): cost does not grow with page depth.
+
+    Raises ValueError for a malformed cursor or a ranked search.
+    """
+    direction, created_at, note_id = decode_cursor(cursor)
+    filters, rank = _note_filters(db, user, search, tag, search_mode)
+    if rank is not None:
+        raise ValueError("Ranked searches can't be paged by cursor, use page")
+    key = tuple_(Note.created_at, Note.id)
+
+    if direction == "next":
+        stmt = (
+            select(*NOTE_COLUMNS)
+            .join(Tag, Tag.id == Note.tag_id)
+            .where(*filters, key < tuple_(created_at, note_id))
+            .order_by(Note.created_at.desc(), Note.id.desc())
+            .limit(per_page + 1)
+        )
+    else:
+        stmt = (
+            select(*NOTE_COLUMNS)
+            .join(Tag, Tag.id == Note.tag_id)
+            .where(*filters, key > tuple_(created_at, note_id))
+            .order_by(Note.created_at.asc(), Note.id.asc())
+            .limit(per_page + 1)
+        )
+
+    rows = list((await db.execute(stmt)).all())
+    has_more = len(rows) > per_page
+    notes = rows[:per_page]
+
+    if direction == "prev":
+        notes.reverse()
+    if not notes:
+        return notes, None, None
+
+    # the extra row tells whether the page continues in the direction of travel;
+    # the other side needs its own check, the cursor's row may have been deleted
+    if direction == "next":
+        has_next = has_more
+        has_prev = await _exists(db, filters, key > tuple_(notes[0].created_at, notes[0].id))
+    else:
+        has_next = await _exists(db, filters, key < tuple_(notes[-1].created_at, notes[-1].id))
+        has_prev = has_more
+    next_cursor = encode_cursor(notes[-1], "next") if has_next else None
+    prev_cursor = encode_cursor(notes[0], "prev") if has_prev else None
+    return notes, next_cursor, prev_cursor
+
+
+async def _exists(db: AsyncSession, filters, condition) -> bool:
+    return (await db.execute(select(select(Note.id).where(*filters, condition).exists()))).scalar_one()
+
+
+def encode_change_token(change_seq: int, note_id: Optional[int] = None) -> str:
+    """Hex change sequence, plus the last note id when a sequence was cut by the limit."""
+    return f"{change_seq:x}" if note_id is None else f"{change_seq:x}.{note_id:x}"
+
+
+def decode_change_token(token: str) -> Tuple[int, Optional[int]]:
+    try:
+        seq, _, note_id = token.partition(".")
+        return int(seq, 16), int(note_id, 16) if note_id else None
+    except ValueError as err:
+        raise ValueError("Invalid change token") from err
+
+
+async def get_changes(
+    db: AsyncSession, user: User, token: Optional[str], limit: int
+) -> Tuple[List[Row], List[int], str, bool]:
+    """Notes written and ids deleted after `token`, in change order.
+
+    Returns (notes, deleted ids, next token, has more). Without a token every
+    note is returned. Both queries are bounded by the version read first, so
+    every change up to it is committed and the next token never skips one.
+    """
+    since_seq, since_id = decode_change_token(token) if token else (-1, None)
+    version = await repository_counters.get_notes_version(db, user.id)
+
+    def after(seq_column, id_column):
+        if since_id is None:
+            return seq_column > since_seq
+        return tuple_(seq_column, id_column) > tuple_(since_seq, since_id)
+
+    notes_stmt = (
+        select(*NOTE_COLUMNS, Note.change_seq)
+        .join(Tag, Tag.id == Note.tag_id)
+        .where(Note.user_id == user.id, after(Note.change_seq, Note.id), Note.change_seq <= version)
+        .order_by(Note.change_seq, Note.id)
+        .limit(limit + 1)
+    )
+    tombstones_stmt = (
+        select(NoteTombstone.change_seq, NoteTombstone.note_id)
+        .where(
+            NoteTombstone.user_id == user.id,
+            after(NoteTombstone.change_seq, NoteTombstone.note_id),
+            NoteTombstone.change_seq <= version,
+        )
+        .order_by(NoteTombstone.change_seq, NoteTombstone.note_id)
+        .limit(limit + 1)
+    )
+    # a note id is either live or deleted, so (change_seq, id) is unique across both
+    changes = sorted(
+        [((row.change_seq, row.id), row) for row in (await db.execute(notes_stmt)).all()]
+        + [((seq, note_id), None) for seq, note_id in (await db.execute(tombstones_stmt)).all()],
+        key=lambda change: change[0],
+    )
+    has_more = len(changes) > limit
+    changes = changes[:limit]
+
+    notes = [row for _, row in changes if row is not None]
+    deleted = [key[1] for key, row in changes if row is None]
+    next_token = encode_change_token(*changes[-1][0]) if has_more else encode_change_token(version)
+    return notes, deleted, next_token, has_more
+
+
+async def stream_notes(db: AsyncSession, user: User, batch_size: int = 1000):
+    """Yield batches of note rows from a server-side cursor, oldest first."""
+    stmt = (
+        select(Note.id, Note.title, Note.content, Tag.name.label("tag"), Note.created_at, Note.updated_at)
+        .join(Tag, Tag.id == Note.tag_id)
+        .where(Note.user_id == user.id)
+        .order_by(Note.created_at, Note.id)
+        .execution_options(yield_per=batch_size)
+    )
+    result = await db.stream(stmt)
+    async for rows in result.partitions():
+        yield rows
+
+
 async def get_note(note_id: int, user: User, db: AsyncSession) -> Note | None:
-    stmt = select(Note).where(and_(Note.id == note_id, Note.user_id == user.id))
+    stmt = (
+        select(Note, Tag.name)
+        .join(Tag, Tag.id == Note.tag_id)
+        .where(and_(Note.id == note_id, Note.user_id == user.id))
+    )
     result = await db.execute(stmt)
-    return result.scalar_one_or_none()
+    return _with_tag(result.one_or_none())
 
 async def create_note(body: NoteSchema, user: User, db: AsyncSession) -> Note:
-    new_note = Note(
-        title=body.title,
-        content=body.content,
-        tag=body.tag,
-        user_id=user.id,
+    change_seq = await repository_counters.begin_note_write(db, user.id)
+    tag_ids = await repository_tags.get_tag_ids(db, user.id, [body.tag])
+    stmt = (
+        insert(Note)
+        .values(
+            title=body.title,
+            content=body.content,
+            tag_id=tag_ids[body.tag],
+            user_id=user.id,
+            change_seq=change_seq,
+        )
+        .returning(Note)
     )
-    db.add(new_note)
+    new_note = (await db.execute(stmt)).scalar_one()
+    new_note.tag = body.tag
+    await repository_counters.bump_note_counters(db, user.id, body.tag, 1)
+    await change_broker.notify(db, user.id, change_event("create", change_seq, new_note.id))
     await db.commit()
-    await db.refresh(new_note)
     return new_note
 
 
-async def remove_note(note_id: int, user: User, db: AsyncSession) -> Note | None:
+async def import_notes(notes: List[NoteSchema], user: User, db: AsyncSession) -> int:
+    """Insert a batch of validated notes in one transaction.
 
-    stmt = select(Note).where(and_(Note.id == note_id, Note.user_id == user.id))
-    result = await db.execute(stmt)
-    note = result.scalar_one_or_none()
+    Uses COPY on asyncpg and a single executemany elsewhere.
+    """
+    if not notes:
+        return 0
+
+    change_seq = await repository_counters.begin_note_write(db, user.id)
+    tag_ids = await repository_tags.get_tag_ids(db, user.id, (note.tag for note in notes))
+    if db.get_bind().dialect.driver == "asyncpg":
+        # COPY skips column defaults, so stamp rows the way func.now() would
+        now = (await db.execute(select(func.localtimestamp()))).scalar_one()
+        connection = await db.connection()
+        raw = await connection.get_raw_connection()
+        await raw.driver_connection.copy_records_to_table(
+            "notes",
+            records=[(note.title, note.content, tag_ids[note.tag], user.id, now, now, change_seq) for note in notes],
+            columns=["title", "content", "tag_id", "user_id", "created_at", "updated_at", "change_seq"],
+        )
+    else:
+        await db.execute(
+            insert(Note),
+            [
+                {
+                    "title": note.title,
+                    "content": note.content,
+                    "tag_id": tag_ids[note.tag],
+                    "user_id": user.id,
+                    "change_seq": change_seq,
+                }
+                for note in notes
+            ],
+        )
+
+    await repository_counters.bump_tag_counters(db, user.id, Counter(note.tag for note in notes))
+    await change_broker.notify(db, user.id, change_event("import", change_seq))
+    await db.commit()
+    return len(notes)
+
+
+async def apply_batch(
+    creates: List[NoteSchema], delete_ids: List[int], user: User, db: AsyncSession
+) -> Tuple[List[Note], List[int]]:
+    """Run creates and deletes in one transaction, one statement each.
+
+    Returns the created notes in request order and the ids actually deleted.
+    """
+    if not creates and not delete_ids:
+        return [], []
+
+    created: List[Note] = []
+    deleted_ids: List[int] = []
+    deltas: dict = {}
+    change_seq = await repository_counters.begin_note_write(db, user.id)
+
+    if creates:
+        tag_ids = await repository_tags.get_tag_ids(db, user.id, (note.tag for note in creates))
+        stmt = insert(Note).returning(Note, sort_by_parameter_order=True)
+        result = await db.execute(
+            stmt,
+            [
+                {
+                    "title": note.title,
+                    "content": note.content,
+                    "tag_id": tag_ids[note.tag],
+                    "user_id": user.id,
+                    "change_seq": change_seq,
+                }
+                for note in creates
+            ],
+        )
+        created = list(result.scalars().all())
+        for note, body in zip(created, creates):
+            note.tag = body.tag
+            deltas[note.tag] = deltas.get(note.tag, 0) + 1
+
+    if delete_ids:
+        stmt = (
+            delete(Note)
+            .where(Note.id.in_(delete_ids), Note.user_id == user.id)
+            .returning(Note.id, tag_name)
+        )
+        for note_id, tag in (await db.execute(stmt)).all():
+            deleted_ids.append(note_id)
+            deltas[tag] = deltas.get(tag, 0) - 1
+        await _add_tombstones(db, user, deleted_ids, change_seq)
+
+    await repository_counters.bump_tag_counters(db, user.id, deltas)
+    # NOTIFY payloads are capped at 8000 bytes, so batch events carry no ids
+    await change_broker.notify(db, user.id, change_event("batch", change_seq))
+    await db.commit()
+    return created, deleted_ids
+
+
+async def _add_tombstones(db: AsyncSession, user: User, note_ids: List[int], change_seq: int) -> None:
+    if note_ids:
+        await db.execute(
+            insert(NoteTombstone),
+            [{"user_id": user.id, "change_seq": change_seq, "note_id": note_id} for note_id in note_ids],
+        )
+
+
+async def remove_note(note_id: int, user: User, db: AsyncSession) -> Note | None:
+    change_seq = await repository_counters.begin_note_write(db, user.id)
+    stmt = (
+        delete(Note)
+        .where(and_(Note.id == note_id, Note.user_id == user.id))
+        .returning(Note, tag_name)
+    )
+    note = _with_tag((await db.execute(stmt)).one_or_none())
 
     if note:
-        await db.delete(note)
+        await repository_counters.bump_note_counters(db, user.id, note.tag, -1)
+        await _add_tombstones(db, user, [note.id], change_seq)
+        await change_broker.notify(db, user.id, change_event("delete", change_seq, note.id))
         await db.commit()
         return note
 
+    await db.rollback()
     return None
 
 
+class NoteConflict(Exception):
+    """The note exists but no longer matches the client's precondition."""
 
 
-# async def update_note(note_id: int, body: NoteUpdate, user: User, db: Session) -> Note | None:
-#     note = db.query(Note).filter(and_(Note.id == note_id, Note.user_id == user.id)).first()
-#     if note:
-#         tags = db.query(Tag).filter(and_(Tag.id.in_(body.tags), Note.user_id == user.id)).all()
-#         note.title = body.title
-#         note.description = body.description
-#         note.done = body.done
-#         note.tags = tags
-#         db.commit()
-#     return note
-
+async def update_note(
+    note_id: int,
+    body: NotePatchSchema | NoteUpdateSchema,
+    user: User,
+    db: AsyncSession,
+    unmodified_since: Optional[datetime] = None,
+) -> Note | None:
+    """Apply the fields set on `body` with a single UPDATE ... RETURNING.
 
-# async def update_status_note(note_id: int, body: NoteStatusUpdate, user: User, db: Session) -> Note | None:
-#     note = db.query(Note).filter(and_(Note.id == note_id, Note.user_id == user.id)).first()
-#     if note:
-#         note.done = body.done
-#         db.commit()
-#     return note
+    `body.version` and `unmodified_since` are optimistic concurrency checks;
+    NoteConflict is raised when the note exists but fails one of them.
+    """
+    values = body.model_dump(exclude_unset=True, exclude_none=True, exclude={"version"})
+    conditions = [Note.id == note_id, Note.user_id == user.id]
+    if body.version is not None:
+        conditions.append(Note.version == body.version)
+    if unmodified_since is not None:
+        # HTTP dates have second precision
+        conditions.append(Note.updated_at < unmodified_since + timedelta(seconds=1))
 
+    change_seq = await repository_counters.begin_note_write(db, user.id)
+    old_tag = None
+    if "tag" in values:
+        # the old tag is only needed to move the counter, so only pay for it then
+        old_tag = (await db.execute(
+            select(Tag.name)
+            .select_from(Note)
+            .join(Tag, Tag.id == Note.tag_id)
+            .where(*conditions)
+            .with_for_update(of=Note)
+        )).scalar_one_or_none()
+        name = values.pop("tag")
+        values["tag_id"] = (await repository_tags.get_tag_ids(db, user.id, [name]))[name]
 
+    stmt = (
+        update(Note)
+        .where(*conditions)
+        .values(**values, updated_at=func.now(), version=Note.version + 1, change_seq=change_seq)
+        .returning(Note, tag_name)
+    )
+    note = _with_tag((await db.execute(stmt)).one_or_none())
 
+    if note is None:
+        await db.rollback()
+        if len(conditions) > 2 and await get_note(note_id, user, db):
+            raise NoteConflict(note_id)
+        return None
 
+    deltas = {old_tag: -1, note.tag: 1} if old_tag is not None and old_tag != note.tag else {}
+    await repository_counters.bump_tag_counters(db, user.id, deltas)
+    await change_broker.notify(db, user.id, change_event("update", change_seq, note.id))
+    await db.commit()
+    return note
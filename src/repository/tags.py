@@ -0,0 +1,33 @@
+from typing import Dict, Iterable
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.database.db import dialect_insert
+from src.database.models import Tag
+
+
+async def _select_tag_ids(db: AsyncSession, user_id: int, names) -> Dict[str, int]:
+    stmt = select(Tag.name, Tag.id).where(Tag.user_id == user_id, Tag.name.in_(names))
+    return dict((await db.execute(stmt)).all())
+
+
+async def get_tag_ids(db: AsyncSession, user_id: int, names: Iterable[str]) -> Dict[str, int]:
+    """Map tag names to ids for the user, creating missing tags in the caller's transaction."""
+    names = set(names)
+    ids = await _select_tag_ids(db, user_id, names)
+    missing = sorted(names - ids.keys())
+    if not missing:
+        return ids
+
+    stmt = (
+        dialect_insert(db)(Tag)
+        .values([{"user_id": user_id, "name": name} for name in missing])
+        .on_conflict_do_nothing(index_elements=[Tag.user_id, Tag.name])
+        .returning(Tag.name, Tag.id)
+    )
+    ids.update((await db.execute(stmt)).all())
+    if len(ids) < len(names):
+        # created concurrently by another transaction after our first select
+        ids.update(await _select_tag_ids(db, user_id, names - ids.keys()))
+    return ids
@@ -1,12 +1,16 @@
 from fastapi import Depends, Response
-from sqlalchemy import select
+from sqlalchemy import select, update
 from sqlalchemy.ext.asyncio import AsyncSession
 from libgravatar import Gravatar
 
+from src.conf.config import config
 from src.database.db import get_db
 from src.database.models import User
 from src.schemas import UserSchema
 from src.services.auth import auth_service
+from src.services.jobs import job_queue
+from src.services.sessions import session_store
+from src.services.user_cache import user_cache
 
 
 async def get_user_by_email(email: str, db: AsyncSession):
@@ -17,26 +21,33 @@ async def get_user_by_email(email: str, db: AsyncSession):
 
 
 async def create_user(body: UserSchema, db: AsyncSession = Depends(get_db)):
-    avatar = None
-    try:
-        g = Gravatar(body.email)
-        avatar = g.get_image(default="identicon")
-    except Exception as err:
-        print(err)
-
-    new_user = User(**body.model_dump(), avatar=avatar)
+    # the Gravatar URL is filled in by a job, signup only shows the placeholder
+    new_user = User(**body.model_dump(), avatar=config.AVATAR_PENDING_URL)
     new_user.username=new_user.email
     db.add(new_user)
+    await db.flush()
+    await job_queue.enqueue(db, "set_gravatar", user_id=new_user.id, email=new_user.email)
     await db.commit()
     await db.refresh(new_user)
     return new_user
 
 
-async def update_token(user: User, token: str | None, db: AsyncSession):
-    user.refresh_token = token
+async def set_gravatar(db: AsyncSession, user_id: int, email: str):
+    avatar = Gravatar(email).get_image(default="identicon")
+    # skip users who uploaded their own avatar in the meantime
+    await db.execute(
+        update(User).where(User.id == user_id, User.avatar == config.AVATAR_PENDING_URL).values(avatar=avatar)
+    )
     await db.commit()
+    user_cache.invalidate(email)
+
 
-async def create_tokens_and_set_cookies(user: User, response: Response, db: AsyncSession):
+job_queue.register("set_gravatar", set_gravatar)
+
+
+async def create_tokens_and_set_cookies(
+    user: User, response: Response, db: AsyncSession, device: str | None = None
+):
     user_data={
         "username": user.username,
         "email": user.email,
@@ -44,8 +55,10 @@ async def create_tokens_and_set_cookies(user: User, response: Response, db: Asyn
     }
 
     access_token = await auth_service.create_access_token({"sub": user.email})
-    refresh_token = await auth_service.create_refresh_token({"sub": user.email})
-    await update_token(user, refresh_token, db)
+    sid, jti = await session_store.create(db, user.id, device, config.SESSION_TTL)
+    refresh_token = await auth_service.create_refresh_token(
+        {"sub": user.email, "sid": sid, "jti": jti}, config.SESSION_TTL
+    )
 
     response.set_cookie(
         key="accessToken",
@@ -60,7 +73,7 @@ async def create_tokens_and_set_cookies(user: User, response: Response, db: Asyn
         key="refreshToken",
         value=refresh_token,
         httponly=True,
-        max_age=60 * 60 * 24 * 7,
+        max_age=config.SESSION_TTL,
         samesite="lax",
         secure=False,
         path="/",
@@ -1,37 +1,54 @@
 from fastapi import APIRouter, HTTPException, Depends, status, Response, Request
 from sqlalchemy.ext.asyncio import AsyncSession
+from src.conf.config import config
 from src.database.db import get_db
 from src.repository import users as repositories_users
 from src.repository.users import create_tokens_and_set_cookies
 from src.schemas import UserSchema, UserResponse
 from src.services.auth import auth_service
+from src.services.rate_limit import login_rate_limit, signup_rate_limit
+from src.services.sessions import session_store
+from src.services.user_cache import user_cache
 
 router = APIRouter(prefix='/auth', tags=['auth'])
 
 
+def _device(request: Request) -> str | None:
+    user_agent = request.headers.get("user-agent")
+    return user_agent[:255] if user_agent else None
 
-@router.post("/signup", response_model=UserResponse, status_code=status.HTTP_201_CREATED)
-async def signup(response: Response, body: UserSchema, db: AsyncSession = Depends(get_db)):
+
+@router.post(
+    "/signup",
+    response_model=UserResponse,
+    status_code=status.HTTP_201_CREATED,
+    dependencies=[Depends(signup_rate_limit)],
+)
+async def signup(request: Request, response: Response, body: UserSchema, db: AsyncSession = Depends(get_db)):
     exist_user = await repositories_users.get_user_by_email(body.email, db)
     if exist_user:
         raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Account already exists")
 
-    body.password = auth_service.get_password_hash(body.password)
+    body.password = await auth_service.get_password_hash(body.password)
     new_user = await repositories_users.create_user(body, db)
 
-    return await create_tokens_and_set_cookies(new_user, response, db)
+    return await create_tokens_and_set_cookies(new_user, response, db, _device(request))
 
 
-@router.post("/login", response_model=UserResponse)
-async def login(response: Response, body: UserSchema, db: AsyncSession = Depends(get_db)):
+@router.post("/login", response_model=UserResponse, dependencies=[Depends(login_rate_limit)])
+async def login(request: Request, response: Response, body: UserSchema, db: AsyncSession = Depends(get_db)):
     user = await repositories_users.get_user_by_email(body.email, db)
 
     if user is None:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="HTTP 401 Unauthorized")
-    if not auth_service.verify_password(body.password, user.password):
+    verified, new_hash = await auth_service.verify_and_update_password(body.password, user.password)
+    if not verified:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="HTTP 401 Unauthorized")
+    if new_hash:
+        user.password = new_hash
+        await db.commit()
 
-    return await create_tokens_and_set_cookies(user, response, db)
+    return await create_tokens_and_set_cookies(user, response, db, _device(request))
 
 
 @router.post("/logout")
@@ -44,10 +61,10 @@ async def logout(
 
     if refresh_token:
         try:
-            email = await auth_service.decode_token(refresh_token, expected_scope="refresh_token")
-            user = await repositories_users.get_user_by_email(email, db)
-            if user:
-                 await repositories_users.update_token(user, None, db)
+            email, sid, _ = await auth_service.decode_refresh_token(refresh_token)
+            user_cache.invalidate(email)
+            if sid:
+                await session_store.revoke(db, sid)
         except Exception:
             pass
 
@@ -64,29 +81,22 @@ async def refresh_token(request: Request, response: Response, db: AsyncSession =
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Missing refresh token")
 
     try:
-        email = await auth_service.decode_token(token, expected_scope="refresh_token")
+        email, sid, jti = await auth_service.decode_refresh_token(token)
     except Exception:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid refresh token")
 
-    user = await repositories_users.get_user_by_email(email, db)
-    if not user:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="User not found"
-        )
-    # print (user.refresh_token)
-    # print(token)
-    if user.refresh_token != token:
-        # await repositories_users.update_token(user, None, db)
+    # sessions are deleted with their user, so no users row lookup is needed
+    new_jti = await session_store.rotate(db, sid, jti, config.SESSION_TTL) if sid and jti else None
+    if new_jti is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid refresh token"
         )
 
     access_token = await auth_service.create_access_token(data={"sub": email})
-    new_refresh_token = await auth_service.create_refresh_token(data={"sub": email})
-
-    await repositories_users.update_token(user, new_refresh_token, db)
+    new_refresh_token = await auth_service.create_refresh_token(
+        data={"sub": email, "sid": sid, "jti": new_jti}, expires_delta=config.SESSION_TTL
+    )
 
     response.set_cookie(
         key="accessToken",
@@ -104,7 +114,7 @@ async def refresh_token(request: Request, response: Response, db: AsyncSession =
         samesite="lax",
         secure=False,
         path="/",
-        max_age=60 * 60 * 24 * 7,
+        max_age=config.SESSION_TTL,
     )
 
     return {"success": True}
\ No newline at end of file
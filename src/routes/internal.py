@@ -0,0 +1,13 @@
+from fastapi import APIRouter, Depends
+
+from src.database.db import engine, pool_status
+from src.services.auth import require_internal_token
+
+router = APIRouter(
+    prefix="/internal", tags=["internal"], include_in_schema=False, dependencies=[Depends(require_internal_token)]
+)
+
+
+@router.get("/pool")
+async def read_pool_status():
+    return pool_status(engine)
@@ -0,0 +1,41 @@
+from fastapi import APIRouter, Depends, FastAPI
+from fastapi.responses import PlainTextResponse
+
+from src.database.db import engine, pool_status
+from src.database.replicas import replica_router
+from src.services import metrics
+from src.services.auth import auth_service, require_internal_token
+from src.services.avatars import avatar_pipeline
+from src.services.change_feed import change_broker
+from src.services.hashing import password_hasher
+from src.services.jobs import job_queue
+from src.services.response_cache import response_cache
+from src.services.user_cache import user_cache
+
+router = APIRouter(tags=["internal"], include_in_schema=False, dependencies=[Depends(require_internal_token)])
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def read_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
+def install(app: FastAPI) -> None:
+    app.add_middleware(metrics.MetricsMiddleware)
+
+    metrics.instrument_engine(engine, "primary")
+    metrics.register_gauges("db_pool_primary", lambda: pool_status(engine))
+    for index, replica in enumerate(replica_router.engines):
+        metrics.instrument_engine(replica, f"replica{index}")
+        metrics.register_gauges(f"db_pool_replica{index}", lambda replica=replica: pool_status(replica))
+
+    metrics.register_gauges("user_cache", user_cache.stats)
+    metrics.register_gauges("token_cache", auth_service.token_cache.stats)
+    if hasattr(response_cache, "stats"):
+        metrics.register_gauges("response_cache", response_cache.stats)
+    metrics.register_gauges("password_hasher", password_hasher.stats)
+    metrics.register_gauges("jobs", job_queue.stats)
+    metrics.register_gauges("change_feed", change_broker.stats)
+    metrics.register_gauges("avatars", avatar_pipeline.stats)
+
+    app.include_router(router)
@@ -1,28 +1,114 @@
-from typing import List, Optional
+import asyncio
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import List, Literal, Optional
 from sqlalchemy import func, or_
-from fastapi import APIRouter, HTTPException, Depends, status, Query
+from fastapi import APIRouter, HTTPException, Depends, Header, status, Query, Request, Response, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import Session
 
 from src.database.db import get_db
+from src.database.replicas import get_read_db, get_write_db, read_session, reads_primary
 from src.database.models import Note
-from src.schemas import NoteSchema, NoteResponseSchema, UserSchema, NotesPageSchema
+from src.schemas import (
+    NoteSchema,
+    NoteResponseSchema,
+    NotePatchSchema,
+    NoteUpdateSchema,
+    UserSchema,
+    NotesPageSchema,
+    NotesImportSchema,
+    NotesBatchSchema,
+    NotesBatchResultSchema,
+    NoteChangesSchema,
+    TagCountSchema,
+)
 from src.repository import notes as repository_notes
+from src.repository import counters as repository_counters
 from src.services.auth import auth_service, get_current_user
+from src.services.change_feed import Subscription, change_broker
+from src.services.etag import etag_matches, make_etag
+from src.services.response_cache import response_cache
+from src.services.serialization import dumps
+from src.services.export import csv_chunks, gzip_chunks, ndjson_chunks
+from src.services.imports import MAX_REPORTED_ERRORS, csv_records, ndjson_records, validated_batches
 
 router = APIRouter(prefix='/notes', tags=["notes"])
 
+CACHE_CONTROL = "private, no-cache"
+# idle change streams send a ping this often so proxies keep them open
+KEEPALIVE_SECONDS = 15.0
+
+
+async def _notes_etag(db: AsyncSession, user, *key) -> str:
+    """ETag for `key` under the user's notes version, which every note write bumps."""
+    version = await repository_counters.get_notes_version(db, user.id)
+    return make_etag(user.id, version, *key)
+
+
+def _set_last_modified(response: Response, note) -> None:
+    # updated_at is naive UTC, see db._engine_kwargs
+    if note.updated_at is not None:
+        response.headers["Last-Modified"] = format_datetime(note.updated_at.replace(tzinfo=timezone.utc), usegmt=True)
+
+
+def _not_modified(request: Request, etag: str) -> Optional[Response]:
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag, "Cache-Control": CACHE_CONTROL})
+    return None
+
 
 @router.get("", response_model=NotesPageSchema)
 async def read_notes(
+    request: Request,
     page: int = Query(1, ge=1),
     perPage: int = Query(12, ge=1, le=100),
     search: str = Query("", min_length=0),
     tag: Optional[str] = Query(None),
-    db: AsyncSession = Depends(get_db),
+    searchMode: Literal["substring", "fulltext", "prefix"] = Query("substring"),
+    cursor: Optional[str] = Query(None),
+    db: AsyncSession = Depends(get_read_db),
     current_user: UserSchema = Depends(get_current_user),
 ):
     tag_value = tag if tag not in (None, "", "All") else None
+
+    etag = await _notes_etag(db, current_user, "list", page, perPage, search, searchMode, tag_value, cursor)
+    not_modified = _not_modified(request, etag)
+    if not_modified is not None:
+        return not_modified
+    headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL}
+
+    # the ETag already identifies (user, notes version, query), so it is the cache key
+    body = await response_cache.get(etag)
+    if body is None:
+        page_data = await _read_notes_page(db, current_user, page, perPage, search, searchMode, tag_value, cursor)
+        # rows already have the NoteResponseSchema columns, so skip revalidation
+        body = dumps(page_data)
+        await response_cache.set(etag, body)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+async def _read_notes_page(db, current_user, page, perPage, search, searchMode, tag_value, cursor) -> dict:
+    if cursor:
+        try:
+            notes, next_cursor, prev_cursor = await repository_notes.get_notes_by_cursor(
+                db=db,
+                user=current_user,
+                per_page=perPage,
+                cursor=cursor,
+                search=search,
+                tag=tag_value,
+                search_mode=searchMode,
+            )
+        except ValueError as err:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(err))
+        return {
+            "notes": [note._asdict() for note in notes],
+            "totalPages": None,
+            "nextCursor": next_cursor,
+            "prevCursor": prev_cursor,
+        }
+
     notes, total_pages = await repository_notes.get_notes_page(
         db=db,
         user=current_user,
@@ -30,22 +116,193 @@ async def read_notes(
         per_page=perPage,
         search=search,
         tag=tag_value,
+        search_mode=searchMode,
     )
-    return {"notes": notes, "totalPages": total_pages}
+    next_cursor = prev_cursor = None
+    # a cursor continues in (created_at, id) order, which isn't the order of a ranked search
+    if notes and not repository_notes.is_ranked(db, search, searchMode):
+        if page < total_pages:
+            next_cursor = repository_notes.encode_cursor(notes[-1], "next")
+        if page > 1:
+            prev_cursor = repository_notes.encode_cursor(notes[0], "prev")
+    return {
+        "notes": [note._asdict() for note in notes],
+        "totalPages": total_pages,
+        "nextCursor": next_cursor,
+        "prevCursor": prev_cursor,
+    }
+
+
+@router.get("/tags", response_model=List[TagCountSchema])
+async def read_tags(
+    request: Request,
+    search: str = Query("", min_length=0),
+    searchMode: Literal["substring", "fulltext", "prefix"] = Query("substring"),
+    db: AsyncSession = Depends(get_read_db),
+    current_user: UserSchema = Depends(get_current_user),
+):
+    etag = await _notes_etag(db, current_user, "tags", search, searchMode)
+    not_modified = _not_modified(request, etag)
+    if not_modified is not None:
+        return not_modified
+
+    body = await response_cache.get(etag)
+    if body is None:
+        counts = await repository_notes.get_tag_counts(db, current_user, search, searchMode)
+        body = dumps([{"tag": tag, "count": count} for tag, count in counts])
+        await response_cache.set(etag, body)
+    return Response(
+        content=body,
+        media_type="application/json",
+        headers={"ETag": etag, "Cache-Control": CACHE_CONTROL},
+    )
+
+
+@router.get("/changes", response_model=NoteChangesSchema)
+async def read_changes(
+    since: Optional[str] = Query(None),
+    limit: int = Query(500, ge=1, le=1000),
+    db: AsyncSession = Depends(get_read_db),
+    current_user: UserSchema = Depends(get_current_user),
+):
+    try:
+        notes, deleted, token, has_more = await repository_notes.get_changes(db, current_user, since, limit)
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid change token")
+    # rows carry change_seq for ordering; the token already encodes it
+    notes = [{key: value for key, value in note._asdict().items() if key != "change_seq"} for note in notes]
+    body = dumps({"notes": notes, "deleted": deleted, "token": token, "hasMore": has_more})
+    return Response(content=body, media_type="application/json", headers={"Cache-Control": "no-store"})
+
+
+async def _change_messages(subscription: Subscription):
+    """Change events as client messages, None for a keepalive; ends when the subscriber is evicted."""
+    while True:
+        try:
+            event = await asyncio.wait_for(subscription.queue.get(), KEEPALIVE_SECONDS)
+        except asyncio.TimeoutError:
+            yield None
+            continue
+        if event is None:
+            return
+        # clients catch up with GET /notes/changes from their own token, this one says how far to go
+        yield dumps({"op": event["op"], "id": event["id"], "token": repository_notes.encode_change_token(event["seq"])})
+
+
+@router.get("/stream")
+async def stream_changes(current_user: UserSchema = Depends(get_current_user)):
+    async def events():
+        async with change_broker.subscribe(current_user.id) as subscription:
+            # subscribed from here on; clients should sync via /notes/changes once this arrives
+            yield b"retry: 3000\n\n"
+            async for message in _change_messages(subscription):
+                yield b": ping\n\n" if message is None else b"event: change\ndata: " + message + b"\n\n"
+            yield b"event: evicted\ndata: {}\n\n"
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-store", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.websocket("/ws")
+async def changes_websocket(
+    websocket: WebSocket,
+    db: AsyncSession = Depends(get_db),
+    current_user: UserSchema = Depends(get_current_user),
+):
+    # the session only served authentication, don't hold its connection for the life of the socket
+    await db.close()
+    await websocket.accept()
+    try:
+        async with change_broker.subscribe(current_user.id) as subscription:
+            async for message in _change_messages(subscription):
+                await websocket.send_text('{"op":"ping"}' if message is None else message.decode())
+        # evicted for falling behind: 1013 asks the client to reconnect and resync
+        await websocket.close(code=1013)
+    except WebSocketDisconnect:
+        pass
+
+
+@router.get("/export")
+async def export_notes(
+    request: Request,
+    format: Literal["ndjson", "csv"] = Query("ndjson"),
+    gzip: bool = Query(False),
+    current_user: UserSchema = Depends(get_current_user),
+):
+    primary = reads_primary(request)
+
+    async def rows():
+        # the session must outlive the handler, so it is opened inside the stream
+        async with read_session(primary) as session:
+            async for batch in repository_notes.stream_notes(session, current_user):
+                yield batch
+
+    chunks = ndjson_chunks(rows()) if format == "ndjson" else csv_chunks(rows())
+    media_type = "application/x-ndjson" if format == "ndjson" else "text/csv"
+    headers = {"Content-Disposition": f'attachment; filename="notes.{format}"'}
+    if gzip:
+        chunks = gzip_chunks(chunks)
+        headers["Content-Encoding"] = "gzip"
+    return StreamingResponse(chunks, media_type=media_type, headers=headers)
+
+
+@router.post("/import", response_model=NotesImportSchema)
+async def import_notes(
+    request: Request,
+    format: Literal["ndjson", "csv"] = Query("ndjson"),
+    db: AsyncSession = Depends(get_write_db),
+    current_user: UserSchema = Depends(get_current_user),
+):
+    parse = ndjson_records if format == "ndjson" else csv_records
+    imported = failed = 0
+    errors = []
+    async for notes, batch_errors in validated_batches(parse(request.stream())):
+        imported += await repository_notes.import_notes(notes, current_user, db)
+        failed += len(batch_errors)
+        errors.extend(batch_errors[:MAX_REPORTED_ERRORS - len(errors)])
+    return {"imported": imported, "failed": failed, "errors": errors}
+
+
+@router.post("/batch", response_model=NotesBatchResultSchema)
+async def batch_notes(
+    body: NotesBatchSchema,
+    db: AsyncSession = Depends(get_write_db),
+    current_user: UserSchema = Depends(get_current_user),
+):
+    delete_ids = list(dict.fromkeys(body.delete))
+    created, deleted_ids = await repository_notes.apply_batch(body.create, delete_ids, current_user, db)
+    deleted = set(deleted_ids)
+    return {
+        "created": created,
+        "deleted": [{"id": note_id, "deleted": note_id in deleted} for note_id in delete_ids],
+    }
 
 
 @router.get("/{note_id}", response_model=NoteResponseSchema)
 async def get_note_by_id(
+    request: Request,
+    response: Response,
     note_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
     current_user: UserSchema = Depends(get_current_user),
 ):
+    etag = await _notes_etag(db, current_user, "note", note_id)
+    not_modified = _not_modified(request, etag)
+    if not_modified is not None:
+        return not_modified
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = CACHE_CONTROL
+
     note = await repository_notes.get_note(note_id, current_user, db)
     if not note:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Note not found"
         )
+    _set_last_modified(response, note)
     return note
 
 @router.post(
@@ -55,39 +312,71 @@ async def get_note_by_id(
 )
 async def create_note(
     body: NoteSchema,
-    db: AsyncSession = Depends(get_db),
+    response: Response,
+    db: AsyncSession = Depends(get_write_db),
     current_user: UserSchema = Depends(get_current_user),
 ):
 
     new_note = await repository_notes.create_note(body, current_user, db)
+    _set_last_modified(response, new_note)
     return new_note
 
 
 
-# @router.put("/{note_id}", response_model=NoteResponseSchema)
-# async def update_note(body: NoteUpdate, note_id: int, db: Session = Depends(get_db),
-#                       current_user: User = Depends(auth_service.get_current_user)):
-#     note = await repository_notes.update_note(note_id, body, current_user, db)
-#     if note is None:
-#         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Note not found")
-#     return note
+def _unmodified_since(value: Optional[str]) -> Optional[datetime]:
+    if not value:
+        return None
+    try:
+        return parsedate_to_datetime(value).astimezone(timezone.utc).replace(tzinfo=None)
+    except (TypeError, ValueError):
+        # an invalid date means the precondition is ignored (RFC 9110)
+        return None
+
+
+async def _update_note(note_id, body, if_unmodified_since, response, db, current_user):
+    try:
+        note = await repository_notes.update_note(
+            note_id, body, current_user, db, unmodified_since=_unmodified_since(if_unmodified_since)
+        )
+    except repository_notes.NoteConflict:
+        raise HTTPException(
+            status_code=status.HTTP_412_PRECONDITION_FAILED,
+            detail="Note was modified by another request",
+        )
+    if note is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Note not found")
+    _set_last_modified(response, note)
+    return note
 
 
-# @router.patch("/{note_id}", response_model=NoteResponseSchema)
-# async def update_status_note(body: NoteStatusUpdate, note_id: int, db: Session = Depends(get_db),
-#                              current_user: User = Depends(auth_service.get_current_user)):
-#     note = await repository_notes.update_status_note(note_id, body, current_user, db)
-#     if note is None:
-#         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Note not found")
-#     return note
+@router.put("/{note_id}", response_model=NoteResponseSchema)
+async def update_note(
+    note_id: int,
+    body: NoteUpdateSchema,
+    response: Response,
+    if_unmodified_since: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_write_db),
+    current_user: UserSchema = Depends(get_current_user),
+):
+    return await _update_note(note_id, body, if_unmodified_since, response, db, current_user)
 
 
+@router.patch("/{note_id}", response_model=NoteResponseSchema)
+async def patch_note(
+    note_id: int,
+    body: NotePatchSchema,
+    response: Response,
+    if_unmodified_since: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_write_db),
+    current_user: UserSchema = Depends(get_current_user),
+):
+    return await _update_note(note_id, body, if_unmodified_since, response, db, current_user)
 
 
 @router.delete("/{note_id}", response_model=NoteResponseSchema)
 async def delete_note(
     note_id: int,
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_write_db),
     current_user: UserSchema = Depends(get_current_user),
 ):
     deleted_note = await repository_notes.remove_note(note_id, current_user, db)
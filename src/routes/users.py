@@ -1,6 +1,3 @@
-import os
-import cloudinary
-import cloudinary.uploader
 from fastapi import (
     APIRouter,
     Depends,
@@ -12,17 +9,14 @@ from src.conf.config import config
 from src.database.db import get_db
 from src.schemas import UserResponse
 from src.services.auth import auth_service, get_current_user
+from src.services.avatars import AvatarTooLarge, avatar_pipeline, spool_upload
+from src.services.jobs import job_queue
+from src.services.user_cache import user_cache
 from src.repository import users as repositories_users
 from fastapi import Request
 
 
 router = APIRouter(prefix="/users", tags=["users"])
-cloudinary.config(
-    cloud_name=config.CLOUDINARY_NAME,
-    api_key=config.CLOUDINARY_API_KEY,
-    api_secret=config.CLOUDINARY_API_SECRET,
-    secure=True,
-)
 
 
 @router.get("/me", response_model=UserResponse)
@@ -79,27 +73,30 @@ async def patch_user(
         if not avatar_file.content_type.startswith("image/"):
             raise HTTPException(status_code=400, detail="Only image files are allowed")
 
-        avatar_file.file.seek(0, os.SEEK_END)
-        file_size = avatar_file.file.tell()
-        avatar_file.file.seek(0)
-        if file_size > 2 * 1024 * 1024:
-            raise HTTPException(status_code=400, detail="File too large (max 2 MB)")
-
-        public_id = f"Web16/{user.email}"
-        res = cloudinary.uploader.upload(avatar_file.file, public_id=public_id, owerite=True)
-        if avatar_file.content_type == "image/svg+xml":
-            res_url = cloudinary.CloudinaryImage(public_id).build_url(
-                format="png", width=120, height=120, crop="fill", version=res.get("version")
+        try:
+            path = await spool_upload(avatar_file, config.AVATAR_MAX_BYTES, config.AVATAR_SPOOL_DIR)
+        except AvatarTooLarge:
+            raise HTTPException(
+                status_code=400, detail=f"File too large (max {config.AVATAR_MAX_BYTES / 1024 / 1024:.3g} MB)"
             )
-        else:
-            res_url = cloudinary.CloudinaryImage(public_id).build_url(
-                width=120, height=120, crop="fill", version=res.get("version")
-            )
-        # res_url = cloudinary.CloudinaryImage(public_id).build_url( version=res.get("version"))
-        user.avatar = res_url
+
+        # resizing and storage run as a job; the pending URL is swapped out when done
+        pending = avatar_pipeline.new_pending_url()
+        await job_queue.enqueue(
+            db,
+            "process_avatar",
+            user_id=user.id,
+            email=user.email,
+            path=path,
+            content_type=avatar_file.content_type,
+            pending=pending,
+            previous=user.avatar,
+        )
+        user.avatar = pending
 
     await db.commit()
     await db.refresh(user)
+    user_cache.invalidate(user.email)
 
     return {
         "username": user.username,
@@ -35,12 +35,59 @@ class NoteSchema(BaseModel):
 
 
 
+class NotePatchSchema(BaseModel):
+    title: Optional[str] = Field(default=None, max_length=50)
+    content: Optional[str] = Field(default=None, max_length=150)
+    tag: Optional[str] = Field(default=None, max_length=50)
+    version: Optional[int] = None
+
+class NoteUpdateSchema(NoteSchema):
+    version: Optional[int] = None
+
 class NoteResponseSchema(NoteSchema):
     id: int
     created_at: datetime
     updated_at: datetime
+    version: int = 1
     model_config = ConfigDict(from_attributes=True)
 
 class NotesPageSchema(BaseModel):
     notes: List[NoteResponseSchema]
-    totalPages: int
+    totalPages: Optional[int] = None
+    nextCursor: Optional[str] = None
+    prevCursor: Optional[str] = None
+
+
+class NoteChangesSchema(BaseModel):
+    notes: List[NoteResponseSchema]
+    deleted: List[int]
+    token: str
+    hasMore: bool
+
+
+class TagCountSchema(BaseModel):
+    tag: str
+    count: int
+
+
+class NoteImportErrorSchema(BaseModel):
+    row: int
+    error: str
+
+class NotesImportSchema(BaseModel):
+    imported: int
+    failed: int
+    errors: List[NoteImportErrorSchema]
+
+
+class NotesBatchSchema(BaseModel):
+    create: List[NoteSchema] = Field(default_factory=list, max_length=500)
+    delete: List[int] = Field(default_factory=list, max_length=500)
+
+class NoteDeleteResultSchema(BaseModel):
+    id: int
+    deleted: bool
+
+class NotesBatchResultSchema(BaseModel):
+    created: List[NoteResponseSchema]
+    deleted: List[NoteDeleteResultSchema]
@@ -1,22 +1,34 @@
-from typing import Optional
-from jose import JWTError, jwt
-from fastapi import HTTPException, status, Request, Depends
+import hashlib
+import secrets
+import time
+from typing import Optional, Tuple
+from fastapi import HTTPException, status, Depends
+from starlette.requests import HTTPConnection
 from fastapi.security import OAuth2PasswordBearer
-from passlib.context import CryptContext
-from datetime import datetime, timedelta
+from src.conf.config import config
 from src.repository import users as repositories_users
 from sqlalchemy.ext.asyncio import AsyncSession
 from src.database.db import get_db
+from src.services.hashing import password_hasher
+from src.services.jwt_backend import TokenDecodeError, get_jwt_backend
+from src.services.lru import LRUCache
+from src.services.user_cache import AuthUser, user_cache
 
 
-async def get_current_user(request: Request, db: AsyncSession = Depends(get_db)):
+async def get_current_user(request: HTTPConnection, db: AsyncSession = Depends(get_db)):
     access_token = request.cookies.get("accessToken")
     if not access_token:
         raise HTTPException(status_code=401, detail="Not authenticated")
 
     try:
         email = await auth_service.decode_token(access_token, expected_scope="access_token")
-        user = await repositories_users.get_user_by_email(email, db)
+        user = user_cache.get(email)
+        if user is None:
+            db_user = await repositories_users.get_user_by_email(email, db)
+            if db_user is None:
+                return None
+            user = AuthUser.from_orm(db_user)
+            user_cache.set(email, user)
 
         return user
 
@@ -24,60 +36,78 @@ async def get_current_user(request: Request, db: AsyncSession = Depends(get_db))
         raise HTTPException(status_code=401, detail="Invalid or expired access token", headers={"X-Token-Expired": "1"},)
 
 
+async def require_internal_token(request: HTTPConnection):
+    """Guard for operational routes: requires `Authorization: Bearer <INTERNAL_API_TOKEN>`."""
+    expected = config.INTERNAL_API_TOKEN
+    if not expected:
+        raise HTTPException(status_code=404, detail="Not Found")
+    scheme, _, token = request.headers.get("authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not secrets.compare_digest(token.encode(), expected.encode()):
+        raise HTTPException(status_code=401, detail="Not authenticated", headers={"WWW-Authenticate": "Bearer"})
+
+
 class Auth:
-    pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
     SECRET_KEY = "secret_key"
     ALGORITHM = "HS256"
+    backend = get_jwt_backend(config.JWT_BACKEND)
+    # verified (scope, sub) keyed by token digest, each entry lives until the token's exp
+    token_cache = LRUCache(config.TOKEN_CACHE_SIZE)
     # oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
 
-    def verify_password(self, plain_password, hashed_password):
-        return self.pwd_context.verify(plain_password, hashed_password)
+    async def verify_password(self, plain_password, hashed_password):
+        verified, _ = await password_hasher.verify_and_update(plain_password, hashed_password)
+        return verified
 
-    def get_password_hash(self, password: str):
-        return self.pwd_context.hash(password)
+    async def verify_and_update_password(self, plain_password, hashed_password):
+        """Return (verified, new_hash); new_hash is set when the stored cost is outdated."""
+        return await password_hasher.verify_and_update(plain_password, hashed_password)
 
-    async def create_access_token(self, data: dict, expires_delta: Optional[float] = None):
+    async def get_password_hash(self, password: str):
+        return await password_hasher.hash(password)
+
+    def _encode(self, data: dict, expires_in: float, scope: str) -> str:
+        now = int(time.time())
         to_encode = data.copy()
-        if expires_delta:
-            expire = datetime.utcnow() + timedelta(seconds=expires_delta)
-        else:
-            expire = datetime.utcnow() + timedelta(minutes=15)
-        to_encode.update({"iat": datetime.utcnow(), "exp": expire, "scope": "access_token"})
-        encoded_access_token = jwt.encode(to_encode, self.SECRET_KEY, algorithm=self.ALGORITHM)
-        return encoded_access_token
+        to_encode.update({"iat": now, "exp": now + int(expires_in), "scope": scope})
+        return self.backend.encode(to_encode, self.SECRET_KEY, self.ALGORITHM)
+
+    async def create_access_token(self, data: dict, expires_delta: Optional[float] = None):
+        return self._encode(data, expires_delta or 60 * 15, "access_token")
 
     async def create_refresh_token(self, data: dict, expires_delta: Optional[float] = None):
-        to_encode = data.copy()
-        if expires_delta:
-            expire = datetime.utcnow() + timedelta(seconds=expires_delta)
-        else:
-            expire = datetime.utcnow() + timedelta(days=7)
-        to_encode.update({"iat": datetime.utcnow(), "exp": expire, "scope": "refresh_token"})
-        encoded_refresh_token = jwt.encode(to_encode, self.SECRET_KEY, algorithm=self.ALGORITHM)
-        return encoded_refresh_token
+        return self._encode(data, expires_delta or 60 * 60 * 24 * 7, "refresh_token")
 
     async def decode_token(self, token: str, expected_scope: str = "access_token"):
+        return (await self._verify(token, expected_scope))[1]
 
-        try:
-            payload = jwt.decode(token, self.SECRET_KEY, algorithms=[self.ALGORITHM])
-            print(payload)
-            if payload.get("exp") and datetime.utcfromtimestamp(payload["exp"]) < datetime.utcnow():
-                raise HTTPException(
-                    status_code=status.HTTP_401_UNAUTHORIZED,
-                    detail="Token expired"
-                )
-            if payload.get("scope") != expected_scope:
+    async def decode_refresh_token(self, token: str) -> Tuple[str, Optional[str], Optional[str]]:
+        """Return (email, session id, token id); tokens issued before sessions have no ids."""
+        _, subject, sid, jti = await self._verify(token, "refresh_token")
+        return subject, sid, jti
+
+    async def _verify(self, token: str, expected_scope: str) -> tuple:
+        digest = hashlib.blake2b(token.encode(), digest_size=16).digest()
+        verified = self.token_cache.get(digest)
+
+        if verified is None:
+            try:
+                payload = self.backend.decode(token, self.SECRET_KEY, self.ALGORITHM)
+            except TokenDecodeError:
                 raise HTTPException(
                     status_code=status.HTTP_401_UNAUTHORIZED,
-                    detail=f"Invalid scope for token. Expected: {expected_scope}"
+                    detail="Could not validate credentials"
                 )
-            return payload.get("sub")
+            verified = (payload.get("scope"), payload.get("sub"), payload.get("sid"), payload.get("jti"))
+            if payload.get("exp"):
+                # the backend has checked exp; keep the result until the token expires
+                self.token_cache.set(digest, verified, ttl=payload["exp"] - time.time())
 
-        except JWTError:
+        if verified[0] != expected_scope:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Could not validate credentials"
+                detail=f"Invalid scope for token. Expected: {expected_scope}"
             )
+        return verified
 
 
 auth_service = Auth()
@@ -0,0 +1,221 @@
+import asyncio
+import hashlib
+import io
+import logging
+import os
+import tempfile
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, Optional, Protocol
+
+from fastapi import UploadFile
+from PIL import Image, ImageOps, UnidentifiedImageError
+from sqlalchemy import update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.conf.config import config
+from src.database.models import User
+from src.services.jobs import job_queue
+from src.services.user_cache import user_cache
+
+logger = logging.getLogger(__name__)
+
+AVATAR_SIZE = 120
+# a 2 MB upload can still decode to a huge bitmap; refuse anything this large
+MAX_IMAGE_PIXELS = 25_000_000
+SPOOL_CHUNK_SIZE = 64 * 1024
+
+
+class AvatarTooLarge(Exception):
+    pass
+
+
+class AvatarDecodeError(Exception):
+    """The upload isn't an image we can decode; retrying won't help."""
+
+
+async def spool_upload(upload: UploadFile, max_bytes: int, directory: Optional[str] = None) -> str:
+    """Copy the upload to a named file the job and its worker processes can open; returns its path."""
+    fd, path = tempfile.mkstemp(prefix="avatar-", dir=directory)
+    size = 0
+    try:
+        with os.fdopen(fd, "wb") as spool:
+            while chunk := await upload.read(SPOOL_CHUNK_SIZE):
+                size += len(chunk)
+                if size > max_bytes:
+                    raise AvatarTooLarge(max_bytes)
+                spool.write(chunk)
+    except BaseException:
+        os.unlink(path)
+        raise
+    return path
+
+
+def render_avatar(path: str, content_type: str, size: int = AVATAR_SIZE) -> bytes:
+    """Decode, crop to a centered square of `size` and encode as PNG. Runs in a worker process.
+
+    Raises AvatarDecodeError when the file isn't a decodable image.
+    """
+    Image.MAX_IMAGE_PIXELS = MAX_IMAGE_PIXELS
+    source = path
+    try:
+        if content_type == "image/svg+xml":
+            # imported here: it loads libcairo, which raster-only deployments needn't have
+            import cairosvg
+
+            source = io.BytesIO(cairosvg.svg2png(url=path, output_width=size, output_height=size))
+
+        with Image.open(source) as image:
+            # JPEG only: let the decoder downscale instead of decoding full size
+            image.draft("RGB", (size * 2, size * 2))
+            image = ImageOps.exif_transpose(image).convert("RGBA")
+            image = ImageOps.fit(image, (size, size), Image.Resampling.LANCZOS)
+    except (UnidentifiedImageError, Image.DecompressionBombError, SyntaxError, ValueError) as err:
+        # Pillow reports corrupt data as SyntaxError/ValueError, cairosvg bad markup as ValueError
+        # or an XML ParseError (a SyntaxError); str() keeps the error picklable across processes
+        raise AvatarDecodeError(str(err)) from None
+    output = io.BytesIO()
+    image.save(output, "PNG", optimize=True)
+    return output.getvalue()
+
+
+class AvatarStorage(Protocol):
+    async def save(self, email: str, data: bytes) -> str:
+        """Store a PNG avatar for `email` and return its public URL."""
+        ...
+
+
+class CloudinaryStorage:
+    def __init__(self, cloud_name: str, api_key: str, api_secret: str, folder: str = "Web16"):
+        import cloudinary
+
+        cloudinary.config(cloud_name=cloud_name, api_key=api_key, api_secret=api_secret, secure=True)
+        self.folder = folder
+
+    async def save(self, email: str, data: bytes) -> str:
+        import cloudinary.uploader
+
+        # the SDK is blocking, keep its network round trip off the event loop
+        result = await asyncio.to_thread(
+            cloudinary.uploader.upload, data, public_id=f"{self.folder}/{email}", overwrite=True, format="png"
+        )
+        return result["secure_url"]
+
+
+class LocalStorage:
+    """Writes avatars under `root`; main.py serves that directory at `base_url`."""
+
+    def __init__(self, root: str, base_url: str):
+        self.root = Path(root)
+        self.base_url = base_url.rstrip("/")
+
+    async def save(self, email: str, data: bytes) -> str:
+        name = f"{hashlib.blake2b(email.encode(), digest_size=16).hexdigest()}.png"
+        await asyncio.to_thread(self._write, name, data)
+        # the file name is stable per user, the query string busts caches on change
+        return f"{self.base_url}/{name}?v={hashlib.blake2b(data, digest_size=8).hexdigest()}"
+
+    def _write(self, name: str, data: bytes) -> None:
+        self.root.mkdir(parents=True, exist_ok=True)
+        tmp = self.root / f".{name}.{uuid.uuid4().hex}"
+        tmp.write_bytes(data)
+        os.replace(tmp, self.root / name)
+
+
+class MemoryStorage:
+    def __init__(self):
+        self.files: Dict[str, bytes] = {}
+
+    async def save(self, email: str, data: bytes) -> str:
+        self.files[email] = data
+        return f"memory://avatars/{email}"
+
+
+def make_avatar_storage() -> AvatarStorage:
+    if config.AVATAR_STORAGE == "local":
+        return LocalStorage(config.AVATAR_LOCAL_DIR, config.AVATAR_LOCAL_URL)
+    if config.AVATAR_STORAGE == "memory":
+        return MemoryStorage()
+    return CloudinaryStorage(config.CLOUDINARY_NAME, config.CLOUDINARY_API_KEY, config.CLOUDINARY_API_SECRET)
+
+
+class AvatarPipeline:
+    """Renders uploads in a process pool and swaps the stored URL in when done.
+
+    Runs as the "process_avatar" job. While an upload is processed the
+    user's avatar is a pending URL unique to that upload, so only the
+    newest upload can replace it.
+    """
+
+    def __init__(self, storage: AvatarStorage, workers: int, pending_url: str):
+        self.storage = storage
+        self.workers = workers
+        self.pending_url = pending_url
+        self.completed = 0
+        self.failed = 0
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers)
+        return self._executor
+
+    def new_pending_url(self) -> str:
+        return f"{self.pending_url}#pending-{uuid.uuid4().hex}"
+
+    async def process(
+        self, db: AsyncSession, user_id: int, email: str, path: str, content_type: str, pending: str,
+        previous: Optional[str],
+    ) -> None:
+        """Render and store the spooled upload at `path`, then replace `pending` with its URL."""
+        try:
+            loop = asyncio.get_running_loop()
+            data = await loop.run_in_executor(self._get_executor(), render_avatar, path, content_type)
+        except AvatarDecodeError:
+            logger.exception("Avatar upload for user %s is not a decodable image", user_id)
+            await self.abandon(db, user_id, email, path, content_type, pending, previous)
+            return
+        # any other error, including storage errors, propagates so the job is retried
+        url = await self.storage.save(email, data)
+        self.completed += 1
+        await self._swap(db, user_id, email, pending, url)
+        _unlink(path)
+
+    async def abandon(
+        self, db: AsyncSession, user_id: int, email: str, path: str, content_type: str, pending: str,
+        previous: Optional[str],
+    ) -> None:
+        """Put the previous avatar back; also runs when the job is dead."""
+        self.failed += 1
+        await self._swap(db, user_id, email, pending, previous)
+        _unlink(path)
+
+    async def _swap(self, db: AsyncSession, user_id: int, email: str, pending: str, url: Optional[str]) -> None:
+        # a newer upload or profile edit may have replaced the pending URL; leave it alone then
+        await db.execute(update(User).where(User.id == user_id, User.avatar == pending).values(avatar=url))
+        await db.commit()
+        user_cache.invalidate(email)
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    def stats(self) -> dict:
+        return {"workers": self.workers, "completed": self.completed, "failed": self.failed}
+
+
+def _unlink(path: str) -> None:
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
+
+
+avatar_pipeline = AvatarPipeline(
+    make_avatar_storage(),
+    workers=config.AVATAR_WORKERS,
+    pending_url=config.AVATAR_PENDING_URL,
+)
+job_queue.register("process_avatar", avatar_pipeline.process, on_dead=avatar_pipeline.abandon)
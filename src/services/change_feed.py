@@ -0,0 +1,149 @@
+import asyncio
+import json
+from abc import ABC, abstractmethod
+from contextlib import asynccontextmanager
+from typing import Dict, Optional, Set
+
+from sqlalchemy import func, select
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.conf.config import config
+
+CHANNEL = "note_changes"
+
+
+class Subscription:
+    """One listener's bounded queue of change events; None in the queue means it was evicted."""
+
+    def __init__(self, user_id: int, max_size: int):
+        self.user_id = user_id
+        self.queue: asyncio.Queue = asyncio.Queue(max_size)
+
+    def evict(self) -> None:
+        # the backlog is useless once events were dropped, the client resyncs via /notes/changes
+        while not self.queue.empty():
+            self.queue.get_nowait()
+        self.queue.put_nowait(None)
+
+
+class ChangeBroker(ABC):
+    """Fans note change events out to the subscribers of each user.
+
+    A subscriber whose queue is full is evicted instead of blocking the
+    others or buffering without bound.
+    """
+
+    def __init__(self, queue_size: int):
+        self.queue_size = queue_size
+        self.evictions = 0
+        self._subscribers: Dict[int, Set[Subscription]] = {}
+
+    async def start(self) -> None:
+        pass
+
+    async def close(self) -> None:
+        self.evict_all()
+
+    @abstractmethod
+    async def notify(self, db: AsyncSession, user_id: int, event: dict) -> None:
+        """Publish `event` to the user's subscribers, from the transaction in `db`."""
+
+    @asynccontextmanager
+    async def subscribe(self, user_id: int):
+        await self.start()
+        subscription = Subscription(user_id, self.queue_size)
+        self._subscribers.setdefault(user_id, set()).add(subscription)
+        try:
+            yield subscription
+        finally:
+            self._remove(subscription)
+
+    def dispatch(self, user_id: int, event: dict) -> None:
+        for subscription in list(self._subscribers.get(user_id, ())):
+            try:
+                subscription.queue.put_nowait(event)
+            except asyncio.QueueFull:
+                self._remove(subscription)
+                subscription.evict()
+                self.evictions += 1
+
+    def evict_all(self) -> None:
+        for subscriptions in list(self._subscribers.values()):
+            for subscription in subscriptions:
+                subscription.evict()
+        self._subscribers.clear()
+
+    def stats(self) -> dict:
+        return {
+            "users": len(self._subscribers),
+            "subscribers": sum(len(subscriptions) for subscriptions in self._subscribers.values()),
+            "evictions": self.evictions,
+        }
+
+    def _remove(self, subscription: Subscription) -> None:
+        subscriptions = self._subscribers.get(subscription.user_id)
+        if subscriptions is not None:
+            subscriptions.discard(subscription)
+            if not subscriptions:
+                del self._subscribers[subscription.user_id]
+
+
+class InProcessBroker(ChangeBroker):
+    """Delivers to subscribers of this process right away; for tests and single-worker runs."""
+
+    async def notify(self, db: AsyncSession, user_id: int, event: dict) -> None:
+        self.dispatch(user_id, event)
+
+
+class PostgresBroker(ChangeBroker):
+    """NOTIFY from the writing transaction, one LISTEN connection per worker."""
+
+    def __init__(self, url: str, queue_size: int):
+        super().__init__(queue_size)
+        self.dsn = make_url(url).set(drivername="postgresql").render_as_string(hide_password=False)
+        self._connection = None
+        self._lock = asyncio.Lock()
+
+    async def start(self) -> None:
+        async with self._lock:
+            if self._connection is None or self._connection.is_closed():
+                import asyncpg
+
+                connection = await asyncpg.connect(self.dsn)
+                await connection.add_listener(CHANNEL, self._on_notify)
+                connection.add_termination_listener(self._on_terminate)
+                self._connection = connection
+
+    async def close(self) -> None:
+        connection, self._connection = self._connection, None
+        if connection is not None:
+            await connection.close()
+        self.evict_all()
+
+    async def notify(self, db: AsyncSession, user_id: int, event: dict) -> None:
+        # Postgres delivers it on commit and drops it on rollback
+        payload = json.dumps({"userId": user_id, **event})
+        await db.execute(select(func.pg_notify(CHANNEL, payload)))
+
+    def _on_notify(self, connection, pid: int, channel: str, payload: str) -> None:
+        event = json.loads(payload)
+        self.dispatch(event.pop("userId"), event)
+
+    def _on_terminate(self, connection) -> None:
+        # events may have been missed; evicted clients reconnect and resync
+        self._connection = None
+        self.evict_all()
+
+
+def make_change_broker() -> ChangeBroker:
+    if config.CHANGE_FEED_BACKEND == "postgres":
+        return PostgresBroker(config.CHANGE_FEED_URL or config.DB_URL, config.CHANGE_FEED_QUEUE_SIZE)
+    return InProcessBroker(config.CHANGE_FEED_QUEUE_SIZE)
+
+
+change_broker: ChangeBroker = make_change_broker()
+
+
+def change_event(op: str, change_seq: int, note_id: Optional[int] = None) -> dict:
+    return {"op": op, "seq": change_seq, "id": note_id}
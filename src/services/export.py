@@ -0,0 +1,52 @@
+import csv
+import io
+import json
+import zlib
+from typing import AsyncIterator, Iterable
+
+EXPORT_FIELDS = ("id", "title", "content", "tag", "created_at", "updated_at")
+
+
+def _isoformat(value):
+    return value.isoformat() if value is not None else None
+
+
+async def ndjson_chunks(batches: AsyncIterator[Iterable]) -> AsyncIterator[bytes]:
+    async for rows in batches:
+        lines = [
+            json.dumps({
+                "id": row.id,
+                "title": row.title,
+                "content": row.content,
+                "tag": row.tag,
+                "created_at": _isoformat(row.created_at),
+                "updated_at": _isoformat(row.updated_at),
+            }, ensure_ascii=False)
+            for row in rows
+        ]
+        yield ("\n".join(lines) + "\n").encode()
+
+
+async def csv_chunks(batches: AsyncIterator[Iterable]) -> AsyncIterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_FIELDS)
+    async for rows in batches:
+        writer.writerows(
+            (row.id, row.title, row.content, row.tag, _isoformat(row.created_at), _isoformat(row.updated_at))
+            for row in rows
+        )
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+
+async def gzip_chunks(chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    compressor = zlib.compressobj(wbits=16 + zlib.MAX_WBITS)
+    async for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
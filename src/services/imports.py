@@ -0,0 +1,93 @@
+import codecs
+import csv
+import json
+from typing import AsyncIterator, List, Tuple
+
+from pydantic import ValidationError
+
+from src.schemas import NoteSchema
+
+IMPORT_BATCH_SIZE = 5000
+MAX_REPORTED_ERRORS = 1000
+
+
+async def _lines(stream: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    pending = ""
+    async for chunk in stream:
+        pending += decoder.decode(chunk)
+        *lines, pending = pending.split("\n")
+        for line in lines:
+            yield line
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield pending
+
+
+async def ndjson_records(stream: AsyncIterator[bytes]) -> AsyncIterator[Tuple[int, dict | str]]:
+    """Yield (row number, parsed object or error message) per non-blank line."""
+    row = 0
+    async for line in _lines(stream):
+        row += 1
+        if not line.strip():
+            continue
+        try:
+            yield row, json.loads(line)
+        except ValueError as err:
+            yield row, f"Invalid JSON: {err}"
+
+
+async def csv_records(stream: AsyncIterator[bytes]) -> AsyncIterator[Tuple[int, dict | str]]:
+    """Yield (row number, field dict or error message) per CSV record after the header."""
+    header = None
+    row = 0
+    record: List[str] = []
+    async for line in _lines(stream):
+        record.append(line)
+        # a quoted field spanning lines leaves an odd number of quotes
+        if sum(part.count('"') for part in record) % 2:
+            continue
+        text, record = "\n".join(record), []
+        if not text.strip():
+            continue
+        try:
+            values = next(csv.reader([text]))
+        except csv.Error as err:
+            row += 1
+            yield row, f"Invalid CSV: {err}"
+            continue
+        if header is None:
+            header = values
+            continue
+        row += 1
+        if len(values) != len(header):
+            yield row, f"Expected {len(header)} fields, got {len(values)}"
+            continue
+        yield row, dict(zip(header, values))
+    if record:
+        yield row + 1, "Invalid CSV: unterminated quoted field"
+
+
+async def validated_batches(
+    records: AsyncIterator[Tuple[int, dict | str]],
+    batch_size: int = IMPORT_BATCH_SIZE,
+) -> AsyncIterator[Tuple[List[NoteSchema], List[dict]]]:
+    """Group records into batches of valid notes plus per-row errors."""
+    notes: List[NoteSchema] = []
+    errors: List[dict] = []
+    async for row, record in records:
+        if isinstance(record, str):
+            errors.append({"row": row, "error": record})
+        else:
+            try:
+                notes.append(NoteSchema.model_validate(record))
+            except ValidationError as err:
+                message = "; ".join(
+                    f"{'.'.join(str(part) for part in e['loc']) or 'row'}: {e['msg']}" for e in err.errors()
+                )
+                errors.append({"row": row, "error": message})
+        if len(notes) >= batch_size:
+            yield notes, errors
+            notes, errors = [], []
+    if notes or errors:
+        yield notes, errors
@@ -0,0 +1,172 @@
+import asyncio
+import logging
+from datetime import timedelta
+from typing import Awaitable, Callable, Dict, NamedTuple, Optional, Set
+
+from sqlalchemy import delete, func, insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.conf.config import config
+from src.database.db import SessionLocal
+from src.database.models import Job
+
+logger = logging.getLogger(__name__)
+
+PENDING = "pending"
+DEAD = "dead"
+
+# handlers get their own session plus the job payload as keyword arguments
+Handler = Callable[..., Awaitable[None]]
+
+
+class _Registration(NamedTuple):
+    run: Handler
+    on_dead: Optional[Handler]
+
+
+class JobQueue:
+    """Durable jobs in the jobs table, run by a pool of asyncio workers.
+
+    Workers claim due jobs with FOR UPDATE SKIP LOCKED and lease them by
+    pushing run_at forward, so a job whose worker died is picked up again
+    once the lease runs out. Failed jobs are retried with exponential
+    backoff; after max_attempts they stay in the table with status 'dead'.
+    """
+
+    def __init__(self, workers: int, poll_interval: float, lease_seconds: float, max_attempts: int, retry_base: float):
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.retry_base = retry_base
+        self.completed = 0
+        self.failed = 0
+        self.dead = 0
+        self._handlers: Dict[str, _Registration] = {}
+        self._active: Set[asyncio.Task] = set()
+        self._loop_task: Optional[asyncio.Task] = None
+
+    def register(self, kind: str, run: Handler, on_dead: Optional[Handler] = None) -> None:
+        """`on_dead` gets the same arguments as `run` once the job has used up its attempts."""
+        self._handlers[kind] = _Registration(run, on_dead)
+
+    async def enqueue(self, db: AsyncSession, kind: str, max_attempts: Optional[int] = None, **payload) -> None:
+        """Add a job to the caller's transaction; it only becomes visible if that commits."""
+        await db.execute(
+            insert(Job).values(kind=kind, payload=payload, max_attempts=max_attempts or self.max_attempts)
+        )
+
+    def start(self) -> None:
+        if self.workers > 0 and self._loop_task is None:
+            self._loop_task = asyncio.create_task(self._poll())
+
+    async def stop(self) -> None:
+        # interrupted jobs keep their lease and are retried once it expires
+        tasks = [task for task in (self._loop_task, *self._active) if task is not None]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._loop_task = None
+
+    async def _poll(self) -> None:
+        while True:
+            free = self.workers - len(self._active)
+            jobs = []
+            if free > 0:
+                try:
+                    jobs = await self._claim(free)
+                except Exception:
+                    logger.exception("Claiming jobs failed")
+            for job in jobs:
+                task = asyncio.create_task(self._run(job))
+                self._active.add(task)
+                task.add_done_callback(self._active.discard)
+            if len(jobs) < free or free <= 0:
+                await asyncio.sleep(self.poll_interval)
+
+    async def _claim(self, limit: int) -> list:
+        due = (
+            select(Job.id)
+            .where(Job.status == PENDING, Job.run_at <= func.now())
+            .order_by(Job.run_at)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+        )
+        stmt = (
+            update(Job)
+            .where(Job.id.in_(due))
+            .values(attempts=Job.attempts + 1, run_at=func.now() + timedelta(seconds=self.lease_seconds))
+            .returning(Job.id, Job.kind, Job.payload, Job.attempts, Job.max_attempts)
+        )
+        async with SessionLocal() as db:
+            jobs = (await db.execute(stmt)).all()
+            await db.commit()
+        return jobs
+
+    async def _run(self, job) -> None:
+        registration = self._handlers.get(job.kind)
+        try:
+            if registration is None:
+                raise LookupError(f"No handler for job kind {job.kind!r}")
+            if job.attempts > job.max_attempts:
+                # claimed again after its worker died on the last attempt
+                raise RuntimeError("Lease expired on the final attempt")
+            async with SessionLocal() as db:
+                # a job must not outlive its lease, or another worker would run it too
+                await asyncio.wait_for(registration.run(db, **job.payload), self.lease_seconds)
+                await db.execute(delete(Job).where(Job.id == job.id))
+                await db.commit()
+            self.completed += 1
+        except Exception as err:
+            await self._fail(job, registration, err)
+
+    async def _fail(self, job, registration: Optional[_Registration], err: Exception) -> None:
+        self.failed += 1
+        logger.error("Job %s (%s) failed on attempt %s", job.id, job.kind, job.attempts, exc_info=err)
+        values = {"last_error": repr(err)[:1000]}
+        dead = job.attempts >= job.max_attempts
+        if dead:
+            values["status"] = DEAD
+        else:
+            delay = min(self.retry_base * 2 ** (job.attempts - 1), 3600)
+            values["run_at"] = func.now() + timedelta(seconds=delay)
+        try:
+            async with SessionLocal() as db:
+                await db.execute(update(Job).where(Job.id == job.id).values(**values))
+                if dead and registration is not None and registration.on_dead is not None:
+                    await registration.on_dead(db, **job.payload)
+                await db.commit()
+        except Exception:
+            # the lease still expires, so the job is retried rather than lost
+            logger.exception("Recording the failure of job %s failed", job.id)
+            return
+        if dead:
+            self.dead += 1
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "active": len(self._active),
+            "completed": self.completed,
+            "failed": self.failed,
+            "dead": self.dead,
+        }
+
+
+async def requeue_dead_jobs(db: AsyncSession, kind: Optional[str] = None) -> int:
+    """Give dead jobs a fresh set of attempts; returns how many were requeued."""
+    stmt = update(Job).where(Job.status == DEAD).values(status=PENDING, attempts=0, run_at=func.now())
+    if kind is not None:
+        stmt = stmt.where(Job.kind == kind)
+    result = await db.execute(stmt)
+    await db.commit()
+    return result.rowcount
+
+
+job_queue = JobQueue(
+    workers=config.JOBS_WORKERS,
+    poll_interval=config.JOBS_POLL_INTERVAL,
+    lease_seconds=config.JOBS_LEASE_SECONDS,
+    max_attempts=config.JOBS_MAX_ATTEMPTS,
+    retry_base=config.JOBS_RETRY_BASE,
+)
@@ -0,0 +1,54 @@
+from typing import Protocol
+
+
+class TokenDecodeError(Exception):
+    pass
+
+
+class JWTBackend(Protocol):
+    def encode(self, payload: dict, key: str, algorithm: str) -> str: ...
+
+    def decode(self, token: str, key: str, algorithm: str) -> dict: ...
+
+
+class JoseBackend:
+    def __init__(self):
+        from jose import JWTError, jwt
+        self._jwt = jwt
+        self._error = JWTError
+
+    def encode(self, payload: dict, key: str, algorithm: str) -> str:
+        return self._jwt.encode(payload, key, algorithm=algorithm)
+
+    def decode(self, token: str, key: str, algorithm: str) -> dict:
+        try:
+            return self._jwt.decode(token, key, algorithms=[algorithm])
+        except self._error as err:
+            raise TokenDecodeError(str(err)) from err
+
+
+class PyJWTBackend:
+    """Backed by PyJWT, which is noticeably faster than python-jose. Install with the pyjwt extra."""
+
+    def __init__(self):
+        import jwt
+        self._jwt = jwt
+
+    def encode(self, payload: dict, key: str, algorithm: str) -> str:
+        return self._jwt.encode(payload, key, algorithm=algorithm)
+
+    def decode(self, token: str, key: str, algorithm: str) -> dict:
+        try:
+            return self._jwt.decode(token, key, algorithms=[algorithm])
+        except self._jwt.PyJWTError as err:
+            raise TokenDecodeError(str(err)) from err
+
+
+JWT_BACKENDS = {
+    "jose": JoseBackend,
+    "pyjwt": PyJWTBackend,
+}
+
+
+def get_jwt_backend(name: str) -> JWTBackend:
+    return JWT_BACKENDS[name]()
@@ -0,0 +1,70 @@
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+
+class LRUCache:
+    """Bounded LRU cache with per-entry expiry and hit/miss counters.
+
+    With `max_bytes` set, values must support len() and the cache also evicts
+    until their total size fits. Not thread-safe: it is only touched from the
+    event loop.
+    """
+
+    def __init__(self, max_size: int, ttl: Optional[float] = None, max_bytes: Optional[int] = None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._bytes = 0
+        self._entries: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+
+    def _sizeof(self, value: Any) -> int:
+        return len(value) if self.max_bytes is not None else 0
+
+    def _pop(self, key: Hashable) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= self._sizeof(entry[1])
+
+    def get(self, key: Hashable) -> Any:
+        entry = self._entries.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            if entry is not None:
+                self._pop(key)
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        ttl = self.ttl if ttl is None else ttl
+        size = self._sizeof(value)
+        if self.max_size <= 0 or (ttl is not None and ttl <= 0):
+            return
+        if self.max_bytes is not None and size > self.max_bytes:
+            return
+        expires_at = time.monotonic() + ttl if ttl is not None else float("inf")
+        self._pop(key)
+        self._entries[key] = (expires_at, value)
+        self._bytes += size
+        while len(self._entries) > self.max_size or (self.max_bytes is not None and self._bytes > self.max_bytes):
+            self._pop(next(iter(self._entries)))
+
+    def invalidate(self, key: Hashable) -> None:
+        self._pop(key)
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._bytes = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> dict:
+        stats = {"size": len(self._entries), "maxSize": self.max_size, "hits": self.hits, "misses": self.misses}
+        if self.max_bytes is not None:
+            stats.update(bytes=self._bytes, maxBytes=self.max_bytes)
+        return stats
@@ -0,0 +1,127 @@
+import hashlib
+import math
+import time
+from typing import Optional, Protocol
+
+from fastapi import HTTPException, Request, status
+
+from src.conf.config import config
+from src.services.lru import LRUCache
+
+
+class BucketStore(Protocol):
+    async def take(self, key: str, burst: int, rate: float) -> float:
+        """Take a token from the bucket; returns 0 on success, else seconds until one is available."""
+        ...
+
+
+class MemoryBucketStore:
+    """Per-worker buckets; each worker enforces the limits on its own."""
+
+    def __init__(self, max_keys: int):
+        self._buckets = LRUCache(max_keys)
+
+    async def take(self, key: str, burst: int, rate: float) -> float:
+        now = time.monotonic()
+        tokens, updated = self._buckets.get(key) or (burst, now)
+        tokens = min(burst, tokens + (now - updated) * rate)
+        retry_after = 0.0
+        if tokens >= 1:
+            tokens -= 1
+        else:
+            retry_after = (1 - tokens) / rate
+        # a bucket left alone this long is full again, same as a missing one
+        self._buckets.set(key, (tokens, now), ttl=burst / rate)
+        return retry_after
+
+
+class RedisBucketStore:
+    """Buckets shared by all workers, updated atomically by a script using the Redis clock."""
+
+    TAKE = """
+    local burst = tonumber(ARGV[1])
+    local rate = tonumber(ARGV[2])
+    local time = redis.call('TIME')
+    local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+    local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+    local tokens = tonumber(bucket[1]) or burst
+    local updated = tonumber(bucket[2]) or now
+    tokens = math.min(burst, tokens + (now - updated) * rate)
+    local retry_after = 0
+    if tokens >= 1 then
+        tokens = tokens - 1
+    else
+        retry_after = (1 - tokens) / rate
+    end
+    redis.call('HSET', KEYS[1], 'tokens', tokens, 'updated', now)
+    redis.call('PEXPIRE', KEYS[1], math.ceil(burst / rate * 1000))
+    return tostring(retry_after)
+    """
+
+    def __init__(self, host: str, port: int, password: Optional[str], prefix: str = "ratelimit:"):
+        import redis.asyncio as redis
+
+        self._redis = redis.Redis(host=host, port=port, password=password)
+        self._take = self._redis.register_script(self.TAKE)
+        self.prefix = prefix
+
+    async def take(self, key: str, burst: int, rate: float) -> float:
+        # scripts return numbers as integers, so the delay comes back as a string
+        return float(await self._take(keys=[self.prefix + key], args=[burst, rate]))
+
+
+class NullBucketStore:
+    async def take(self, key: str, burst: int, rate: float) -> float:
+        return 0.0
+
+
+def make_bucket_store() -> BucketStore:
+    if config.RATE_LIMIT_BACKEND == "redis":
+        return RedisBucketStore(config.REDIS_DOMAIN, config.REDIS_PORT, config.REDIS_PASSWORD)
+    if config.RATE_LIMIT_BACKEND == "memory":
+        return MemoryBucketStore(config.RATE_LIMIT_MAX_KEYS)
+    return NullBucketStore()
+
+
+bucket_store: BucketStore = make_bucket_store()
+
+
+class AuthRateLimit:
+    """Dependency throttling an auth route per client IP, then per email.
+
+    It runs before the handler, so a rejected request costs no bcrypt work
+    and no database query.
+    """
+
+    def __init__(self, scope: str):
+        self.scope = scope
+
+    async def __call__(self, request: Request) -> None:
+        ip = request.client.host if request.client else "unknown"
+        await self._take(f"{self.scope}:ip:{ip}", config.AUTH_RATE_IP_BURST, config.AUTH_RATE_IP_PER_MINUTE)
+
+        # FastAPI has already read the body for the route, so this reads the cached bytes;
+        # a missing or malformed body is left for the route's validation to turn into a 422
+        try:
+            body = await request.json()
+        except ValueError:
+            body = None
+        email = body.get("email") if isinstance(body, dict) else None
+        if isinstance(email, str) and email:
+            digest = hashlib.blake2b(email.strip().lower().encode(), digest_size=16).hexdigest()
+            await self._take(
+                f"{self.scope}:email:{digest}", config.AUTH_RATE_EMAIL_BURST, config.AUTH_RATE_EMAIL_PER_MINUTE
+            )
+
+    async def _take(self, key: str, burst: int, per_minute: float) -> None:
+        retry_after = await bucket_store.take(key, burst, per_minute / 60)
+        if retry_after > 0:
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Too many attempts, try again later",
+                headers={"Retry-After": str(math.ceil(retry_after))},
+            )
+
+
+login_rate_limit = AuthRateLimit("login")
+signup_rate_limit = AuthRateLimit("signup")
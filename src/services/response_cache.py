@@ -0,0 +1,68 @@
+from typing import Optional, Protocol
+
+from src.conf.config import config
+from src.services.lru import LRUCache
+
+
+class ResponseCache(Protocol):
+    async def get(self, key: str) -> Optional[bytes]: ...
+
+    async def set(self, key: str, value: bytes) -> None: ...
+
+
+class MemoryResponseCache:
+    """Per-worker cache bounded by entry count, total bytes and TTL."""
+
+    def __init__(self, max_entries: int, max_bytes: int, ttl: float):
+        self._cache = LRUCache(max_entries, ttl=ttl, max_bytes=max_bytes)
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return self._cache.get(key)
+
+    async def set(self, key: str, value: bytes) -> None:
+        self._cache.set(key, value)
+
+    def stats(self) -> dict:
+        return self._cache.stats()
+
+
+class RedisResponseCache:
+    """Cache shared by all workers; Redis itself handles TTL and memory eviction."""
+
+    def __init__(self, host: str, port: int, password: Optional[str], ttl: float, prefix: str = "notes:page:"):
+        import redis.asyncio as redis
+
+        self._redis = redis.Redis(host=host, port=port, password=password)
+        self.ttl = ttl
+        self.prefix = prefix
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return await self._redis.get(self.prefix + key)
+
+    async def set(self, key: str, value: bytes) -> None:
+        await self._redis.set(self.prefix + key, value, px=int(self.ttl * 1000))
+
+
+class NullResponseCache:
+    async def get(self, key: str) -> Optional[bytes]:
+        return None
+
+    async def set(self, key: str, value: bytes) -> None:
+        pass
+
+
+def make_response_cache() -> ResponseCache:
+    if config.RESPONSE_CACHE_BACKEND == "redis":
+        return RedisResponseCache(
+            config.REDIS_DOMAIN, config.REDIS_PORT, config.REDIS_PASSWORD, ttl=config.RESPONSE_CACHE_TTL
+        )
+    if config.RESPONSE_CACHE_BACKEND == "memory":
+        return MemoryResponseCache(
+            config.RESPONSE_CACHE_MAX_ENTRIES, config.RESPONSE_CACHE_MAX_BYTES, ttl=config.RESPONSE_CACHE_TTL
+        )
+    return NullResponseCache()
+
+
+# keys embed the user's notes version, so a note write makes every cached page
+# of that user unreachable; replace this object to plug in another backend
+response_cache: ResponseCache = make_response_cache()
@@ -0,0 +1,6 @@
+import orjson
+
+
+def dumps(content) -> bytes:
+    """Serialize plain dicts/lists to JSON bytes; datetimes come out in ISO 8601."""
+    return orjson.dumps(content)
@@ -0,0 +1,134 @@
+import hashlib
+import secrets
+from datetime import timedelta
+from typing import Optional, Protocol, Tuple
+
+from sqlalchemy import delete, insert, select, update, func
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.conf.config import config
+from src.database.models import UserSession
+
+
+def _digest(value: str) -> str:
+    return hashlib.blake2b(value.encode(), digest_size=32).hexdigest()
+
+
+def _new_id() -> str:
+    return secrets.token_urlsafe(16)
+
+
+class SessionStore(Protocol):
+    """Refresh-token sessions, one per login.
+
+    A refresh token carries the session id (sid) and a token id (jti)
+    that changes on every rotation; only digests of both are stored.
+    Backends that don't need a database ignore `db`.
+    """
+
+    async def create(self, db: AsyncSession, user_id: int, device: Optional[str], ttl: float) -> Tuple[str, str]:
+        """Start a session; returns its (sid, jti)."""
+        ...
+
+    async def rotate(self, db: AsyncSession, sid: str, jti: str, ttl: float) -> Optional[str]:
+        """Swap `jti` for a new one and extend the session; None if it is unknown, expired or `jti` is stale."""
+        ...
+
+    async def revoke(self, db: AsyncSession, sid: str) -> None: ...
+
+
+class DatabaseSessionStore:
+    async def create(self, db: AsyncSession, user_id: int, device: Optional[str], ttl: float) -> Tuple[str, str]:
+        sid, jti = _new_id(), _new_id()
+        await db.execute(
+            insert(UserSession).values(
+                id=_digest(sid),
+                user_id=user_id,
+                token_hash=_digest(jti),
+                device=device,
+                expires_at=func.now() + timedelta(seconds=ttl),
+            )
+        )
+        await db.commit()
+        return sid, jti
+
+    async def rotate(self, db: AsyncSession, sid: str, jti: str, ttl: float) -> Optional[str]:
+        new_jti = _new_id()
+        # one primary key lookup that both checks the presented token and replaces it
+        stmt = (
+            update(UserSession)
+            .where(
+                UserSession.id == _digest(sid),
+                UserSession.token_hash == _digest(jti),
+                UserSession.expires_at > func.now(),
+            )
+            .values(token_hash=_digest(new_jti), expires_at=func.now() + timedelta(seconds=ttl))
+            .returning(UserSession.id)
+        )
+        rotated = (await db.execute(stmt)).first() is not None
+        await db.commit()
+        return new_jti if rotated else None
+
+    async def revoke(self, db: AsyncSession, sid: str) -> None:
+        await db.execute(delete(UserSession).where(UserSession.id == _digest(sid)))
+        await db.commit()
+
+
+class RedisSessionStore:
+    """Sessions as Redis hashes that expire on their own."""
+
+    ROTATE = """
+    if redis.call('HGET', KEYS[1], 'token_hash') == ARGV[1] then
+        redis.call('HSET', KEYS[1], 'token_hash', ARGV[2])
+        redis.call('PEXPIRE', KEYS[1], ARGV[3])
+        return 1
+    end
+    return 0
+    """
+
+    def __init__(self, host: str, port: int, password: Optional[str], prefix: str = "session:"):
+        import redis.asyncio as redis
+
+        self._redis = redis.Redis(host=host, port=port, password=password)
+        self._rotate = self._redis.register_script(self.ROTATE)
+        self.prefix = prefix
+
+    async def create(self, db: AsyncSession, user_id: int, device: Optional[str], ttl: float) -> Tuple[str, str]:
+        sid, jti = _new_id(), _new_id()
+        key = self.prefix + _digest(sid)
+        async with self._redis.pipeline(transaction=True) as pipe:
+            pipe.hset(key, mapping={"user_id": user_id, "token_hash": _digest(jti), "device": device or ""})
+            pipe.pexpire(key, int(ttl * 1000))
+            await pipe.execute()
+        return sid, jti
+
+    async def rotate(self, db: AsyncSession, sid: str, jti: str, ttl: float) -> Optional[str]:
+        new_jti = _new_id()
+        rotated = await self._rotate(
+            keys=[self.prefix + _digest(sid)], args=[_digest(jti), _digest(new_jti), int(ttl * 1000)]
+        )
+        return new_jti if rotated else None
+
+    async def revoke(self, db: AsyncSession, sid: str) -> None:
+        await self._redis.delete(self.prefix + _digest(sid))
+
+
+async def delete_expired_sessions(db: AsyncSession, batch_size: int = 1000) -> int:
+    """Delete expired database sessions in batches, committing each; returns how many went."""
+    deleted = 0
+    while True:
+        batch = select(UserSession.id).where(UserSession.expires_at <= func.now()).limit(batch_size)
+        result = await db.execute(delete(UserSession).where(UserSession.id.in_(batch)))
+        await db.commit()
+        deleted += result.rowcount
+        if result.rowcount < batch_size:
+            return deleted
+
+
+def make_session_store() -> SessionStore:
+    if config.SESSION_STORE == "redis":
+        return RedisSessionStore(config.REDIS_DOMAIN, config.REDIS_PORT, config.REDIS_PASSWORD)
+    return DatabaseSessionStore()
+
+
+session_store: SessionStore = make_session_store()
@@ -0,0 +1,22 @@
+from dataclasses import dataclass
+from typing import Optional
+
+from src.conf.config import config
+from src.services.lru import LRUCache
+
+
+@dataclass(frozen=True)
+class AuthUser:
+    """Detached snapshot of the fields routes read from the current user."""
+    id: int
+    username: Optional[str]
+    email: str
+    avatar: Optional[str]
+
+    @classmethod
+    def from_orm(cls, user) -> "AuthUser":
+        return cls(id=user.id, username=user.username, email=user.email, avatar=user.avatar)
+
+
+# keyed by token subject (email)
+user_cache = LRUCache(config.USER_CACHE_SIZE, config.USER_CACHE_TTL)
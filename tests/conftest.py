@@ -0,0 +1,169 @@
+import asyncio
+import os
+from pathlib import Path
+
+import pytest
+
+# Settings are read when src.conf.config is imported, so fill them in first. DB_URL is
+# always replaced: the Postgres tests truncate every table of the database they get.
+TEST_DATABASE_URL = os.environ.get("TEST_DATABASE_URL")
+os.environ["DB_URL"] = TEST_DATABASE_URL or "postgresql+asyncpg://postgres@localhost/unused"
+for key, value in {
+    "SECRET_KEY_JWT": "test-secret",
+    "ALGORITHM": "HS256",
+    "MAIL_USERNAME": "test@example.com",
+    "MAIL_PASSWORD": "test",
+    "MAIL_FROM": "test@example.com",
+    "MAIL_PORT": "1025",
+    "MAIL_SERVER": "localhost",
+    "MAIL_FROM_NAME": "Notes",
+    "REDIS_DOMAIN": "localhost",
+    "REDIS_PORT": "6379",
+    "CLOUDINARY_NAME": "test",
+    "CLOUDINARY_API_KEY": "test",
+    "CLOUDINARY_API_SECRET": "test",
+}.items():
+    os.environ.setdefault(key, value)
+for key, value in {
+    "RESPONSE_CACHE_BACKEND": "memory",
+    "CHANGE_FEED_BACKEND": "memory",
+    "AVATAR_STORAGE": "memory",
+    "SESSION_STORE": "database",
+    "RATE_LIMIT_BACKEND": "memory",
+    "JOBS_WORKERS": "0",
+    "DB_REPLICA_URLS": "[]",
+}.items():
+    os.environ[key] = value
+
+TABLES = ("jobs", "sessions", "note_tombstones", "note_counters", "notes", "tags", "users")
+
+
+@pytest.fixture(scope="session")
+def run():
+    """Run a coroutine on a fresh event loop, then drop the pooled connections bound to it."""
+    from src.database.db import engine
+
+    def run(coro):
+        async def main():
+            try:
+                return await coro
+            finally:
+                await engine.dispose()
+
+        return asyncio.run(main())
+
+    return run
+
+
+@pytest.fixture(scope="session")
+def migrated_database():
+    """Bring TEST_DATABASE_URL to the latest revision; skips the test without one."""
+    if not TEST_DATABASE_URL:
+        pytest.skip("TEST_DATABASE_URL is not set")
+    from alembic import command
+    from alembic.config import Config
+
+    command.upgrade(Config(str(Path(__file__).parent.parent / "alembic.ini")), "head")
+
+
+@pytest.fixture
+def database(migrated_database, run):
+    """An empty migrated database; yields its async session factory."""
+    from sqlalchemy import text
+
+    from src.database.db import SessionLocal
+
+    async def truncate():
+        async with SessionLocal() as session:
+            await session.execute(text(f"TRUNCATE {', '.join(TABLES)} RESTART IDENTITY CASCADE"))
+            await session.commit()
+
+    run(truncate())
+    yield SessionLocal
+
+
+@pytest.fixture
+def sqlite_database(tmp_path, run):
+    """A fresh SQLite database created from the models; yields its async session factory."""
+    from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+    from sqlalchemy.pool import NullPool
+
+    from src.database.models import Base
+
+    # every run() has its own event loop, so connections can't be pooled across calls
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'notes.db'}", poolclass=NullPool)
+
+    async def create():
+        async with engine.begin() as connection:
+            await connection.run_sync(Base.metadata.create_all)
+
+    run(create())
+    yield async_sessionmaker(bind=engine, autocommit=False, autoflush=False, expire_on_commit=False)
+
+
+@pytest.fixture(params=["sqlite", "postgresql"])
+def any_database(request):
+    """Runs the test on SQLite and, when TEST_DATABASE_URL is set, on Postgres."""
+    return request.getfixturevalue("sqlite_database" if request.param == "sqlite" else "database")
+
+
+@pytest.fixture
+def fake_redis(monkeypatch):
+    """Point the Redis backends at an in-process server that runs their Lua scripts; returns a client."""
+    from functools import partial
+
+    import fakeredis
+    import redis.asyncio
+
+    server = fakeredis.FakeServer()
+    monkeypatch.setattr(redis.asyncio, "Redis", partial(fakeredis.FakeAsyncRedis, server=server))
+    return fakeredis.FakeAsyncRedis(server=server)
+
+
+@pytest.fixture
+def client(database, run, monkeypatch):
+    """TestClient on the app, signed in as a fresh user (`client.user`), with an empty response cache."""
+    from fastapi.testclient import TestClient
+    from sqlalchemy import insert
+    from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+    from sqlalchemy.pool import NullPool
+
+    from main import app
+    from src.database.db import _engine_kwargs, get_db
+    from src.database.models import User
+    from src.database.replicas import get_read_db, get_write_db
+    from src.routes import notes
+    from src.services.auth import get_current_user
+    from src.services.response_cache import MemoryResponseCache
+    from src.services.user_cache import AuthUser
+
+    async def make_user():
+        async with database() as db:
+            user = (await db.execute(
+                insert(User).values(email="client@example.com", password="x").returning(User)
+            )).scalar_one()
+            await db.commit()
+            return AuthUser.from_orm(user)
+
+    user = run(make_user())
+    # TestClient runs every request on a new event loop, so connections can't be pooled
+    engine = create_async_engine(
+        TEST_DATABASE_URL, poolclass=NullPool, connect_args=_engine_kwargs(TEST_DATABASE_URL)["connect_args"]
+    )
+    sessions = async_sessionmaker(bind=engine, autocommit=False, autoflush=False, expire_on_commit=False)
+
+    async def session():
+        async with sessions() as db:
+            yield db
+
+    monkeypatch.setattr(notes, "response_cache", MemoryResponseCache(100, 1 << 20, ttl=60))
+    app.dependency_overrides.update({
+        get_db: session,
+        get_read_db: session,
+        get_write_db: session,
+        get_current_user: lambda: user,
+    })
+    client = TestClient(app)
+    client.user = user
+    yield client
+    app.dependency_overrides.clear()
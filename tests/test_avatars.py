@@ -0,0 +1,110 @@
+import io
+
+import pytest
+from PIL import Image
+from sqlalchemy import insert, select, update
+
+from src.database.models import User
+from src.services.avatars import AVATAR_SIZE, AvatarDecodeError, AvatarPipeline, MemoryStorage, render_avatar
+
+PENDING = "https://example.com/pending.png"
+PREVIOUS = "https://example.com/previous.png"
+
+
+def image_file(tmp_path, name: str, size, format: str, mode: str = "RGB") -> str:
+    path = tmp_path / name
+    Image.new(mode, size, "red").save(path, format)
+    return str(path)
+
+
+def decoded(data: bytes) -> Image.Image:
+    image = Image.open(io.BytesIO(data))
+    image.load()
+    return image
+
+
+@pytest.mark.parametrize("size, format", [((300, 200), "PNG"), ((50, 400), "JPEG"), ((2000, 1500), "JPEG")])
+def test_render_raster(tmp_path, size, format):
+    path = image_file(tmp_path, f"upload.{format.lower()}", size, format)
+    image = decoded(render_avatar(path, f"image/{format.lower()}"))
+    assert (image.format, image.size, image.mode) == ("PNG", (AVATAR_SIZE, AVATAR_SIZE), "RGBA")
+
+
+def test_render_svg(tmp_path):
+    try:
+        import cairosvg  # noqa: F401
+    except OSError:
+        pytest.skip("libcairo isn't installed")
+    path = tmp_path / "upload.svg"
+    path.write_text('<svg xmlns="http://www.w3.org/2000/svg" width="10" height="20"><rect width="10" height="20"/></svg>')
+    image = decoded(render_avatar(str(path), "image/svg+xml"))
+    assert (image.format, image.size) == ("PNG", (AVATAR_SIZE, AVATAR_SIZE))
+
+
+def test_render_garbage(tmp_path):
+    path = tmp_path / "upload.png"
+    path.write_bytes(b"not an image at all")
+    with pytest.raises(AvatarDecodeError):
+        render_avatar(str(path), "image/png")
+
+
+def test_render_decompression_bomb(tmp_path):
+    path = image_file(tmp_path, "bomb.png", (7200, 7200), "PNG", mode="1")
+    with pytest.raises(AvatarDecodeError):
+        render_avatar(path, "image/png")
+
+
+@pytest.fixture
+def pipeline():
+    pipeline = AvatarPipeline(MemoryStorage(), workers=1, pending_url=PENDING)
+    yield pipeline
+    pipeline.shutdown()
+
+
+def test_process_and_abandon(any_database, run, pipeline, tmp_path):
+    upload = image_file(tmp_path, "upload.png", (300, 200), "PNG")
+    garbage = tmp_path / "garbage.png"
+    garbage.write_bytes(b"garbage")
+
+    async def avatar(db, user_id):
+        return (await db.execute(select(User.avatar).where(User.id == user_id))).scalar_one()
+
+    async def main():
+        async with any_database() as db:
+            first = pipeline.new_pending_url()
+            user_id = (await db.execute(
+                insert(User).values(email="avatar@example.com", password="x", avatar=first).returning(User.id)
+            )).scalar_one()
+            await db.commit()
+
+            await pipeline.process(db, user_id, "avatar@example.com", upload, "image/png", first, PREVIOUS)
+            assert await avatar(db, user_id) == "memory://avatars/avatar@example.com"
+            assert decoded(pipeline.storage.files["avatar@example.com"]).size == (AVATAR_SIZE, AVATAR_SIZE)
+
+            # a garbage upload puts the previous avatar back
+            second = pipeline.new_pending_url()
+            await db.execute(update(User).where(User.id == user_id).values(avatar=second))
+            await db.commit()
+            await pipeline.process(db, user_id, "avatar@example.com", str(garbage), "image/png", second, PREVIOUS)
+            assert await avatar(db, user_id) == PREVIOUS
+            assert pipeline.stats() == {"workers": 1, "completed": 1, "failed": 1}
+
+    run(main())
+    assert not (tmp_path / "upload.png").exists() and not garbage.exists()
+
+
+def test_newer_upload_is_not_overwritten(any_database, run, pipeline, tmp_path):
+    async def main():
+        async with any_database() as db:
+            older, newer = pipeline.new_pending_url(), pipeline.new_pending_url()
+            user_id = (await db.execute(
+                insert(User).values(email="avatar@example.com", password="x", avatar=newer).returning(User.id)
+            )).scalar_one()
+            await db.commit()
+
+            upload = image_file(tmp_path, "older.png", (300, 200), "PNG")
+            await pipeline.process(db, user_id, "avatar@example.com", upload, "image/png", older, PREVIOUS)
+            await pipeline.abandon(db, user_id, "avatar@example.com", upload, "image/png", older, PREVIOUS)
+            assert (await db.execute(select(User.avatar).where(User.id == user_id))).scalar_one() == newer
+
+    run(main())
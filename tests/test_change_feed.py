@@ -0,0 +1,58 @@
+import asyncio
+
+import pytest
+
+from src.services.change_feed import ChangeBroker, InProcessBroker, change_event
+
+
+def test_broker_is_abstract():
+    with pytest.raises(TypeError):
+        ChangeBroker(4)
+
+
+def test_dispatch_to_the_users_subscribers():
+    broker = InProcessBroker(4)
+
+    async def main():
+        async with broker.subscribe(1) as first, broker.subscribe(1) as second, broker.subscribe(2) as other:
+            assert broker.stats() == {"users": 2, "subscribers": 3, "evictions": 0}
+            await broker.notify(None, 1, change_event("create", 5, 10))
+            assert first.queue.get_nowait() == second.queue.get_nowait() == change_event("create", 5, 10)
+            assert other.queue.empty()
+        assert broker.stats() == {"users": 0, "subscribers": 0, "evictions": 0}
+
+    asyncio.run(main())
+
+
+def test_full_queue_evicts_only_that_subscriber():
+    broker = InProcessBroker(2)
+
+    async def main():
+        async with broker.subscribe(1) as slow, broker.subscribe(1) as fast:
+            for seq in range(2):
+                await broker.notify(None, 1, change_event("update", seq, 1))
+                fast.queue.get_nowait()
+            await broker.notify(None, 1, change_event("update", 2, 1))
+            # the backlog is dropped and None tells the reader to resync
+            assert slow.queue.get_nowait() is None and slow.queue.empty()
+            assert fast.queue.get_nowait() == change_event("update", 2, 1)
+            assert broker.stats() == {"users": 1, "subscribers": 1, "evictions": 1}
+
+            await broker.notify(None, 1, change_event("update", 3, 1))
+            assert slow.queue.empty()
+
+    asyncio.run(main())
+
+
+def test_close_evicts_everyone():
+    broker = InProcessBroker(4)
+
+    async def main():
+        async with broker.subscribe(1) as first, broker.subscribe(2) as second:
+            await broker.notify(None, 1, change_event("delete", 1, 1))
+            await broker.close()
+            assert first.queue.get_nowait() is None and first.queue.empty()
+            assert second.queue.get_nowait() is None
+            assert broker.stats()["subscribers"] == 0
+
+    asyncio.run(main())
@@ -0,0 +1,84 @@
+import pytest
+from sqlalchemy import insert
+
+from src.database.models import User
+from src.repository import counters as repository_counters
+from src.repository import notes as repository_notes
+from src.repository.notes import decode_change_token, encode_change_token
+from src.schemas import NoteSchema
+
+
+@pytest.mark.parametrize("seq, note_id", [(0, None), (255, None), (4096, 17), (1, 0)])
+def test_change_token_round_trip(seq, note_id):
+    assert decode_change_token(encode_change_token(seq, note_id)) == (seq, note_id)
+
+
+def test_change_token_format():
+    assert encode_change_token(255) == "ff"
+    assert encode_change_token(255, 16) == "ff.10"
+
+
+@pytest.mark.parametrize("token", ["", "xyz", "ff.zz", "1.2.3"])
+def test_invalid_change_token(token):
+    with pytest.raises(ValueError, match="Invalid change token"):
+        decode_change_token(token)
+
+
+def test_changes_page_through_writes_and_deletes(database, run):
+    async def main():
+        async with database() as db:
+            user = (await db.execute(
+                insert(User).values(email="sync@example.com", password="x").returning(User)
+            )).scalar_one()
+            await db.commit()
+            notes, deleted, token, has_more = await repository_notes.get_changes(db, user, None, 10)
+            assert (notes, deleted, has_more) == ([], [], False)
+
+            # one sequence holding more changes than a page, then single writes
+            created, _ = await repository_notes.apply_batch(
+                [NoteSchema(title=f"note {i}", content="x", tag="t") for i in range(3)], [], user, db
+            )
+            kept = await repository_notes.create_note(NoteSchema(title="kept", content="x", tag="t"), user, db)
+            await repository_notes.remove_note(created[1].id, user, db)
+
+            seen, gone, pages = [], [], 0
+            while True:
+                notes, deleted, token, has_more = await repository_notes.get_changes(db, user, token, 2)
+                seen += [note.id for note in notes]
+                gone += deleted
+                pages += 1
+                if not has_more:
+                    break
+            assert seen == [created[0].id, created[2].id, kept.id]
+            assert gone == [created[1].id]
+            assert pages == 2
+
+            assert await repository_notes.get_changes(db, user, token, 2) == ([], [], token, False)
+
+    run(main())
+
+
+def test_empty_batch_is_not_a_change(any_database, run, monkeypatch):
+    events = []
+
+    async def notify(db, user_id, event):
+        events.append(event)
+
+    monkeypatch.setattr(repository_notes.change_broker, "notify", notify)
+
+    async def main():
+        async with any_database() as db:
+            user = (await db.execute(
+                insert(User).values(email="batch@example.com", password="x").returning(User)
+            )).scalar_one()
+            await db.commit()
+            await repository_notes.create_note(NoteSchema(title="note", content="x", tag="t"), user, db)
+            version = await repository_counters.get_notes_version(db, user.id)
+
+            assert await repository_notes.apply_batch([], [], user, db) == ([], [])
+            assert await repository_counters.get_notes_version(db, user.id) == version
+            _, _, token, _ = await repository_notes.get_changes(db, user, None, 10)
+            assert token == encode_change_token(version)
+
+    run(main())
+    assert len(events) == 1
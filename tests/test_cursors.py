@@ -0,0 +1,89 @@
+import base64
+import json
+from datetime import datetime
+from types import SimpleNamespace
+
+import pytest
+
+from src.repository.notes import decode_cursor, encode_cursor
+
+
+@pytest.mark.parametrize("direction", ["next", "prev"])
+def test_cursor_round_trip(direction):
+    row = SimpleNamespace(created_at=datetime(2025, 3, 4, 5, 6, 7, 890123), id=42)
+    cursor = encode_cursor(row, direction)
+    assert "=" not in cursor
+    assert decode_cursor(cursor) == (direction, row.created_at, 42)
+
+
+def raw_cursor(value) -> str:
+    return base64.urlsafe_b64encode(json.dumps(value).encode()).decode()
+
+
+MALFORMED = [
+    "",
+    "not a cursor!",
+    base64.urlsafe_b64encode(b"\xff\xfe").decode(),
+    raw_cursor(["sideways", "2025-03-04T05:06:07", 1]),
+    raw_cursor(["next", "yesterday", 1]),
+    raw_cursor(["next", "2025-03-04T05:06:07", "one"]),
+    raw_cursor(["next", "2025-03-04T05:06:07"]),
+    raw_cursor({"direction": "next"}),
+    raw_cursor(7),
+]
+
+
+@pytest.mark.parametrize("cursor", MALFORMED)
+def test_malformed_cursor(cursor):
+    with pytest.raises(ValueError, match="Invalid cursor"):
+        decode_cursor(cursor)
+
+
+@pytest.mark.parametrize("cursor", MALFORMED[1:])
+def test_malformed_cursor_is_400(client, cursor):
+    response = client.get("/api/notes", params={"cursor": cursor})
+    assert response.status_code == 400
+    assert response.json() == {"detail": "Invalid cursor"}
+
+
+def page(client, **params) -> tuple:
+    body = client.get("/api/notes", params={"perPage": 3, **params}).json()
+    return [note["title"] for note in body["notes"]], body["nextCursor"], body["prevCursor"]
+
+
+def test_paging_forward_and_back(client):
+    for i in range(1, 8):
+        client.post("/api/notes", json={"title": f"note {i}", "content": "x", "tag": "t"})
+
+    first, next_cursor, prev_cursor = page(client)
+    assert first == ["note 7", "note 6", "note 5"] and prev_cursor is None
+
+    second, next_cursor, prev_cursor = page(client, cursor=next_cursor)
+    assert second == ["note 4", "note 3", "note 2"]
+    last, end, back = page(client, cursor=next_cursor)
+    assert last == ["note 1"] and end is None
+
+    assert page(client, cursor=back)[0] == second
+    titles, next_cursor, prev_cursor = page(client, cursor=prev_cursor)
+    # back on the first page: nothing earlier to go to
+    assert titles == first and prev_cursor is None
+    assert page(client, cursor=next_cursor)[0] == second
+
+    # an offset page hands out cursors both ways
+    titles, next_cursor, prev_cursor = page(client, page=2)
+    assert titles == second
+    assert page(client, cursor=prev_cursor) == (first, page(client)[1], None)
+    assert page(client, cursor=next_cursor)[0] == last
+
+
+def test_cursor_past_deleted_rows(client):
+    ids = [
+        client.post("/api/notes", json={"title": f"note {i}", "content": "x", "tag": "t"}).json()["id"]
+        for i in range(1, 5)
+    ]
+    _, next_cursor, _ = page(client, perPage=2)
+    # the page's rows are gone, so the cursor points at nothing
+    for note_id in ids[2:]:
+        client.delete(f"/api/notes/{note_id}")
+    titles, next_cursor, prev_cursor = page(client, perPage=2, cursor=next_cursor)
+    assert (titles, next_cursor, prev_cursor) == (["note 2", "note 1"], None, None)
@@ -0,0 +1,58 @@
+import pytest
+
+from src.services.etag import etag_matches, make_etag
+
+ETAG = make_etag(1, 7, "list")
+
+
+def test_make_etag():
+    assert ETAG.startswith('"') and ETAG.endswith('"') and len(ETAG) == 34
+    assert make_etag(1, 7, "list") == ETAG
+    assert make_etag(1, 8, "list") != ETAG
+    # parts are separated, so shifting text between them changes the tag
+    assert make_etag("a", "bc") != make_etag("ab", "c")
+
+
+@pytest.mark.parametrize("if_none_match, matches", [
+    (None, False),
+    ("", False),
+    ("*", True),
+    (" * ", True),
+    (ETAG, True),
+    (f"W/{ETAG}", True),
+    (f'"other", {ETAG}', True),
+    (f'W/"other",W/{ETAG}', True),
+    ('"other"', False),
+    (ETAG.strip('"'), False),
+    (f'"other", W/"also-other"', False),
+])
+def test_etag_matches(if_none_match, matches):
+    assert etag_matches(if_none_match, ETAG) is matches
+
+
+def get(client, url: str, etag: str | None = None):
+    return client.get(url, headers={"If-None-Match": etag} if etag else {})
+
+
+def test_note_writes_change_list_and_detail_etags(client):
+    note = client.post("/api/notes", json={"title": "note", "content": "x", "tag": "a"}).json()
+    urls = ["/api/notes", f"/api/notes/{note['id']}", "/api/notes/tags"]
+    etags = {}
+    for url in urls:
+        response = get(client, url)
+        assert response.status_code == 200
+        etags[url] = response.headers["ETag"]
+        assert response.headers["Cache-Control"] == "private, no-cache"
+
+        not_modified = get(client, url, f'W/{etags[url]}, "stale"')
+        assert not_modified.status_code == 304
+        assert not_modified.headers["ETag"] == etags[url] and not_modified.content == b""
+    assert len(set(etags.values())) == 3
+
+    client.patch(f"/api/notes/{note['id']}", json={"title": "changed"})
+    for url in urls:
+        response = get(client, url, etags[url])
+        assert response.status_code == 200
+        assert response.headers["ETag"] != etags[url]
+    assert get(client, "/api/notes").json()["notes"][0]["title"] == "changed"
+    assert get(client, f"/api/notes/{note['id']}").json()["title"] == "changed"
@@ -0,0 +1,173 @@
+import asyncio
+import time
+
+import pytest
+from sqlalchemy import event, func, insert, select
+
+from src.database.models import Note, Tag, User
+from src.repository import counters as repository_counters
+from src.repository import notes as repository_notes
+from src.schemas import NoteSchema
+from src.services.imports import csv_records, ndjson_records, validated_batches
+
+
+async def chunks(*parts: bytes):
+    for part in parts:
+        yield part
+
+
+def collect(records):
+    async def main():
+        return [record async for record in records]
+
+    return asyncio.run(main())
+
+
+def test_csv_records():
+    records = collect(csv_records(chunks(b"title,content,tag\nfirst,hello,work\n\nsecond,bye,home\n")))
+    assert records == [
+        (1, {"title": "first", "content": "hello", "tag": "work"}),
+        (2, {"title": "second", "content": "bye", "tag": "home"}),
+    ]
+
+
+def test_csv_quoted_fields_across_lines_and_chunks():
+    body = 'title,content,tag\n"a, b","line one\nline ""two""",t\nnext,x,y'.encode()
+    records = collect(csv_records(chunks(*(body[i:i + 5] for i in range(0, len(body), 5)))))
+    assert records == [
+        (1, {"title": "a, b", "content": 'line one\nline "two"', "tag": "t"}),
+        (2, {"title": "next", "content": "x", "tag": "y"}),
+    ]
+
+
+def test_csv_utf8_split_between_chunks():
+    body = "title,content,tag\nnaïve,café,ü\n".encode()
+    split = body.index("ï".encode()) + 1
+    assert collect(csv_records(chunks(body[:split], body[split:]))) == [
+        (1, {"title": "naïve", "content": "café", "tag": "ü"}),
+    ]
+
+
+def test_csv_field_count_errors():
+    records = collect(csv_records(chunks(b"title,content,tag\nonly,two\nok,fine,tag\na,b,c,d\n")))
+    assert records == [
+        (1, "Expected 3 fields, got 2"),
+        (2, {"title": "ok", "content": "fine", "tag": "tag"}),
+        (3, "Expected 3 fields, got 4"),
+    ]
+
+
+def test_csv_unterminated_quote():
+    records = collect(csv_records(chunks(b'title,content,tag\nok,fine,tag\nbad,"never closed,tag\nmore\n')))
+    assert records == [
+        (1, {"title": "ok", "content": "fine", "tag": "tag"}),
+        (2, "Invalid CSV: unterminated quoted field"),
+    ]
+
+
+def test_ndjson_records():
+    body = b'{"title": "a", "content": "b", "tag": "c"}\n\n{"title": \n[1, 2]\n'
+    records = collect(ndjson_records(chunks(body)))
+    assert records[0] == (1, {"title": "a", "content": "b", "tag": "c"})
+    assert records[1][0] == 3 and records[1][1].startswith("Invalid JSON: ")
+    assert records[2] == (4, [1, 2])
+
+
+def test_validated_batches():
+    async def records():
+        yield 1, {"title": "a", "content": "b", "tag": "c"}
+        yield 2, "Invalid JSON: nope"
+        yield 3, {"title": "x" * 51, "content": "b", "tag": "c"}
+        yield 4, {"title": "d", "content": "e", "tag": "f"}
+        yield 5, {"title": "g", "content": "h"}
+
+    batches = collect(validated_batches(records(), batch_size=1))
+    assert [[note.title for note in notes] for notes, _ in batches] == [["a"], ["d"], []]
+    assert [errors for _, errors in batches] == [
+        [],
+        [{"row": 2, "error": "Invalid JSON: nope"}, {"row": 3, "error": "title: String should have at most 50 characters"}],
+        [{"row": 5, "error": "tag: Field required"}],
+    ]
+
+
+def make_user(db):
+    return db.execute(insert(User).values(email="import@example.com", password="x").returning(User))
+
+
+def test_import_notes_counts_and_tags(any_database, run):
+    async def main():
+        async with any_database() as db:
+            user = (await make_user(db)).scalar_one()
+            await db.commit()
+            existing = await repository_notes.create_note(NoteSchema(title="old", content="x", tag="a"), user, db)
+            version = await repository_counters.get_notes_version(db, user.id)
+
+            assert await repository_notes.import_notes([], user, db) == 0
+            assert await repository_counters.get_notes_version(db, user.id) == version
+
+            notes = [NoteSchema(title=f"n{i}", content="x", tag=tag) for i, tag in enumerate(["a", "b", "a", "c"])]
+            assert await repository_notes.import_notes(notes, user, db) == 4
+
+            tags = dict((await db.execute(select(Tag.name, Tag.id).where(Tag.user_id == user.id))).all())
+            assert sorted(tags) == ["a", "b", "c"] and tags["a"] == existing.tag_id
+            rows = (await db.execute(
+                select(Note.title, Note.tag_id, Note.change_seq).where(Note.user_id == user.id, Note.id != existing.id)
+            )).all()
+            assert sorted((title, tag_id) for title, tag_id, _ in rows) == [
+                ("n0", tags["a"]), ("n1", tags["b"]), ("n2", tags["a"]), ("n3", tags["c"])
+            ]
+            # one import is one change
+            assert {seq for _, _, seq in rows} == {version + 1}
+            assert await repository_counters.get_notes_version(db, user.id) == version + 1
+            assert await repository_counters.get_note_count(db, user.id) == 5
+            assert await repository_counters.get_tag_counts(db, user.id) == [("a", 3), ("b", 1), ("c", 1)]
+
+    run(main())
+
+
+def test_import_without_copy(sqlite_database, run):
+    """Drivers other than asyncpg insert with a single executemany."""
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if executemany:
+            statements.append(statement)
+
+    async def main():
+        async with sqlite_database() as db:
+            user = (await make_user(db)).scalar_one()
+            await db.commit()
+            engine = db.get_bind()
+            event.listen(engine, "before_cursor_execute", capture)
+            try:
+                notes = [NoteSchema(title=f"n{i}", content="x", tag="t") for i in range(100)]
+                assert await repository_notes.import_notes(notes, user, db) == 100
+            finally:
+                event.remove(engine, "before_cursor_execute", capture)
+            assert (await db.execute(select(func.count()).select_from(Note))).scalar_one() == 100
+
+    run(main())
+    assert len(statements) == 1 and statements[0].startswith("INSERT INTO notes")
+
+
+@pytest.mark.benchmark
+def test_import_throughput(database, run):
+    """50k notes through the import pipeline: CSV parsing, validation and COPY, in the route's batches."""
+    count = 50_000
+    body = "title,content,tag\n" + "".join(f"note {i},imported content {i},tag{i % 20}\n" for i in range(count))
+
+    async def main():
+        async with database() as db:
+            user = (await make_user(db)).scalar_one()
+            await db.commit()
+            start = time.perf_counter()
+            imported = 0
+            async for notes, errors in validated_batches(csv_records(chunks(body.encode()))):
+                assert not errors
+                imported += await repository_notes.import_notes(notes, user, db)
+            return imported, time.perf_counter() - start
+
+    imported, elapsed = run(main())
+    print(f"\nimported {imported:,} notes at {imported / elapsed:,.0f} notes/s")
+    assert imported == count
+    assert imported / elapsed >= 10_000
@@ -0,0 +1,126 @@
+from datetime import timedelta
+
+from sqlalchemy import func, select, update
+
+from src.database.models import Job
+from src.services.jobs import DEAD, PENDING, JobQueue, requeue_dead_jobs
+
+
+def make_queue(calls: list, fail: bool = False) -> JobQueue:
+    queue = JobQueue(workers=0, poll_interval=1, lease_seconds=30, max_attempts=2, retry_base=10)
+
+    async def run(db, **payload):
+        calls.append(("run", payload))
+        if fail:
+            raise RuntimeError("boom")
+
+    async def on_dead(db, **payload):
+        calls.append(("dead", payload))
+
+    queue.register("test", run, on_dead=on_dead)
+    return queue
+
+
+async def enqueue(database, queue: JobQueue, **kwargs) -> None:
+    async with database() as db:
+        await queue.enqueue(db, "test", **kwargs)
+        await db.commit()
+
+
+async def job_state(database):
+    """(status, attempts, seconds until run_at, last_error) of the only job, or None."""
+    async with database() as db:
+        row = (await db.execute(
+            select(Job.status, Job.attempts, func.extract("epoch", Job.run_at - func.now()), Job.last_error)
+        )).one_or_none()
+        return row and (row[0], row[1], float(row[2]), row[3])
+
+
+def test_claim_leases_the_job(database, run):
+    queue = make_queue([])
+
+    async def main():
+        await enqueue(database, queue, note=1)
+        [job] = await queue._claim(10)
+        assert (job.kind, job.payload, job.attempts, job.max_attempts) == ("test", {"note": 1}, 1, 2)
+        # leased: invisible to other workers until the lease runs out
+        assert await queue._claim(10) == []
+        status, attempts, due_in, _ = await job_state(database)
+        assert (status, attempts) == (PENDING, 1) and 25 < due_in <= 30
+
+    run(main())
+
+
+def test_uncommitted_job_is_invisible(database, run):
+    queue = make_queue([])
+
+    async def main():
+        async with database() as db:
+            await queue.enqueue(db, "test")
+            assert await queue._claim(10) == []
+            await db.rollback()
+        assert await job_state(database) is None
+
+    run(main())
+
+
+def test_completed_job_is_deleted(database, run):
+    calls = []
+    queue = make_queue(calls)
+
+    async def main():
+        await enqueue(database, queue, note=1)
+        [job] = await queue._claim(10)
+        await queue._run(job)
+        assert await job_state(database) is None
+
+    run(main())
+    assert calls == [("run", {"note": 1})]
+    assert queue.stats()["completed"] == 1
+
+
+def test_failure_backs_off_then_goes_dead(database, run):
+    calls = []
+    queue = make_queue(calls, fail=True)
+
+    async def main():
+        await enqueue(database, queue, note=1)
+        [job] = await queue._claim(10)
+        await queue._run(job)
+        status, attempts, due_in, error = await job_state(database)
+        assert (status, attempts, error) == (PENDING, 1, "RuntimeError('boom')")
+        assert 5 < due_in <= 10
+
+        async with database() as db:
+            await db.execute(update(Job).values(run_at=func.now() - timedelta(seconds=1)))
+            await db.commit()
+        [job] = await queue._claim(10)
+        await queue._run(job)
+        status, attempts, _, _ = await job_state(database)
+        assert (status, attempts) == (DEAD, 2)
+        assert await queue._claim(10) == []
+
+        async with database() as db:
+            assert await requeue_dead_jobs(db, "other") == 0
+            assert await requeue_dead_jobs(db, "test") == 1
+        [job] = await queue._claim(10)
+        assert job.attempts == 1
+
+    run(main())
+    assert calls == [("run", {"note": 1}), ("run", {"note": 1}), ("dead", {"note": 1})]
+    assert queue.stats() == {"workers": 0, "active": 0, "completed": 0, "failed": 2, "dead": 1}
+
+
+def test_unknown_kind_fails(database, run):
+    queue = make_queue([])
+
+    async def main():
+        async with database() as db:
+            await queue.enqueue(db, "missing", max_attempts=1)
+            await db.commit()
+        [job] = await queue._claim(10)
+        await queue._run(job)
+        status, _, _, error = await job_state(database)
+        assert status == DEAD and error.startswith("LookupError")
+
+    run(main())
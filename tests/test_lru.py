@@ -0,0 +1,76 @@
+from types import SimpleNamespace
+
+import pytest
+
+from src.services import lru
+from src.services.lru import LRUCache
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = SimpleNamespace(now=1000.0)
+    monkeypatch.setattr(lru, "time", SimpleNamespace(monotonic=lambda: clock.now))
+    return clock
+
+
+def test_evicts_least_recently_used():
+    cache = LRUCache(2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert (cache.get("a"), cache.get("c")) == (1, 3)
+    assert cache.stats() == {"size": 2, "maxSize": 2, "hits": 3, "misses": 1}
+
+
+def test_byte_accounting():
+    cache = LRUCache(10, max_bytes=10)
+    cache.set("a", b"1234")
+    cache.set("b", b"1234")
+    assert cache.stats()["bytes"] == 8
+    cache.set("a", b"12")
+    assert cache.stats()["bytes"] == 6
+    cache.set("c", b"123456")
+    # b is now the oldest and goes first
+    assert cache.get("b") is None
+    assert cache.stats()["bytes"] == 8
+    cache.invalidate("a")
+    assert cache.stats()["bytes"] == 6
+    cache.clear()
+    assert cache.stats()["bytes"] == 0 and len(cache) == 0
+
+
+def test_oversize_value_is_not_cached():
+    cache = LRUCache(10, max_bytes=4)
+    cache.set("a", b"1234")
+    cache.set("b", b"12345")
+    assert cache.get("b") is None
+    assert cache.get("a") == b"1234"
+    assert cache.stats()["bytes"] == 4
+
+
+def test_ttl(clock):
+    cache = LRUCache(10, ttl=5)
+    cache.set("a", 1)
+    cache.set("b", 2, ttl=60)
+    clock.now += 5
+    assert cache.get("a") == 1
+    clock.now += 1
+    assert cache.get("a") is None
+    assert cache.get("b") == 2
+    assert len(cache) == 1
+
+
+def test_expired_entry_frees_its_bytes(clock):
+    cache = LRUCache(10, ttl=1, max_bytes=10)
+    cache.set("a", b"12345")
+    clock.now += 2
+    assert cache.get("a") is None
+    assert cache.stats()["bytes"] == 0
+
+
+def test_nothing_cached_without_room_or_time():
+    for cache in (LRUCache(0), LRUCache(10, ttl=0)):
+        cache.set("a", b"1")
+        assert len(cache) == 0
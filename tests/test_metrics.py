@@ -0,0 +1,69 @@
+import logging
+
+from fastapi.testclient import TestClient
+
+from src.services import metrics
+from src.services.metrics import Counter, Histogram
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = Histogram("latency_seconds", "Latency.", (0.1, 1.0), ("route",))
+    for value in (0.05, 0.1, 0.5, 2.0, 3.0):
+        histogram.observe(("/a",), value)
+    assert histogram.render() == [
+        "# HELP latency_seconds Latency.",
+        "# TYPE latency_seconds histogram",
+        # a value on a bound falls in that bucket: le is "less than or equal"
+        'latency_seconds_bucket{route="/a",le="0.1"} 2',
+        'latency_seconds_bucket{route="/a",le="1.0"} 3',
+        'latency_seconds_bucket{route="/a",le="+Inf"} 5',
+        'latency_seconds_sum{route="/a"} 5.65',
+        'latency_seconds_count{route="/a"} 5',
+    ]
+
+
+def test_label_values_are_escaped():
+    counter = Counter("requests_total", "Requests.", ("route", "status"))
+    counter.inc(('/say "hi"\\\n', "200"), 2)
+    assert counter.render()[2] == 'requests_total{route="/say \\"hi\\"\\\\\\n",status="200"} 2'
+    unlabelled = Counter("events_total", "Events.")
+    unlabelled.inc()
+    assert unlabelled.render()[2] == "events_total 1"
+
+
+def test_render(monkeypatch):
+    counter = Counter("requests_total", "Requests.", ("route",))
+    counter.inc(("/a",))
+    monkeypatch.setattr(metrics, "METRICS", [counter])
+    monkeypatch.setattr(metrics, "_gauges", {})
+    metrics.register_gauges("db_pool", lambda: {"checkedOut": 2, "maxOverflow": 10, "healthy": True, "name": "x"})
+    assert metrics.render() == "\n".join([
+        "# HELP requests_total Requests.",
+        "# TYPE requests_total counter",
+        'requests_total{route="/a"} 1',
+        # camelCase keys become snake_case; flags and strings aren't numbers
+        "# TYPE db_pool_checked_out gauge",
+        "db_pool_checked_out 2",
+        "# TYPE db_pool_max_overflow gauge",
+        "db_pool_max_overflow 10",
+    ]) + "\n"
+
+
+def test_failed_health_check_is_logged(caplog):
+    from main import app
+    from src.database.db import get_db
+
+    class Broken:
+        async def execute(self, statement):
+            raise OSError("connection refused")
+
+    app.dependency_overrides[get_db] = lambda: Broken()
+    try:
+        with caplog.at_level(logging.ERROR, logger="main"):
+            response = TestClient(app).get("/api/healthchecker")
+    finally:
+        app.dependency_overrides.clear()
+    assert response.status_code == 500
+    assert response.json() == {"detail": "Error connecting to the database"}
+    [record] = caplog.records
+    assert record.message == "Health check failed" and "connection refused" in record.exc_text
@@ -0,0 +1,83 @@
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+
+import pytest
+
+
+def create(client, tag: str = "a") -> dict:
+    response = client.post("/api/notes", json={"title": "note", "content": "x", "tag": tag})
+    assert response.status_code == 201
+    return response.json() | {"lastModified": response.headers["Last-Modified"]}
+
+
+def tags(client) -> list:
+    return client.get("/api/notes/tags").json()
+
+
+def test_version_check(client):
+    note = create(client)
+    assert note["version"] == 1
+    response = client.put(f"/api/notes/{note['id']}", json={"title": "new", "content": "x", "tag": "a", "version": 2})
+    assert response.status_code == 412
+    assert client.get(f"/api/notes/{note['id']}").json()["title"] == "note"
+
+    response = client.patch(f"/api/notes/{note['id']}", json={"title": "new", "version": 1})
+    assert response.status_code == 200
+    assert (response.json()["title"], response.json()["version"]) == ("new", 2)
+    # the same version can't win twice
+    assert client.patch(f"/api/notes/{note['id']}", json={"title": "again", "version": 1}).status_code == 412
+
+
+def test_if_unmodified_since_has_second_precision(client):
+    note = create(client)
+    url = f"/api/notes/{note['id']}"
+    last_modified = parsedate_to_datetime(note["lastModified"])
+
+    # updated_at has sub-second precision but still passes against its own, truncated, Last-Modified
+    response = client.patch(url, json={"content": "y"}, headers={"If-Unmodified-Since": note["lastModified"]})
+    assert response.status_code == 200
+
+    earlier = format_datetime(last_modified - timedelta(seconds=1), usegmt=True)
+    assert client.patch(url, json={"content": "z"}, headers={"If-Unmodified-Since": earlier}).status_code == 412
+    # an invalid date is ignored
+    assert client.patch(url, json={"content": "z"}, headers={"If-Unmodified-Since": "yesterday"}).status_code == 200
+
+
+@pytest.mark.parametrize("headers, body", [
+    ({}, {"title": "new"}),
+    ({}, {"title": "new", "version": 1}),
+    ({"If-Unmodified-Since": "Thu, 01 Jan 1970 00:00:00 GMT"}, {"title": "new"}),
+])
+def test_missing_note_is_404_not_412(client, headers, body):
+    create(client)
+    assert client.patch("/api/notes/999", json=body, headers=headers).status_code == 404
+
+
+def test_tag_change_moves_the_counter(client):
+    note = create(client, "a")
+    create(client, "a")
+    assert tags(client) == [{"tag": "a", "count": 2}]
+
+    assert client.patch(f"/api/notes/{note['id']}", json={"tag": "b"}).json()["tag"] == "b"
+    assert tags(client) == [{"tag": "a", "count": 1}, {"tag": "b", "count": 1}]
+
+    # other fields, or the same tag again, leave the counters alone
+    client.patch(f"/api/notes/{note['id']}", json={"title": "new"})
+    client.put(f"/api/notes/{note['id']}", json={"title": "new", "content": "x", "tag": "b"})
+    assert tags(client) == [{"tag": "a", "count": 1}, {"tag": "b", "count": 1}]
+    # a failed precondition changes nothing
+    client.patch(f"/api/notes/{note['id']}", json={"tag": "c", "version": 1})
+    assert tags(client) == [{"tag": "a", "count": 1}, {"tag": "b", "count": 1}]
+
+
+def test_last_modified_is_utc(client):
+    note = create(client)
+    response = client.patch(f"/api/notes/{note['id']}", json={"title": "new"})
+    header = response.headers["Last-Modified"]
+    assert header.endswith(" GMT")
+    last_modified = parsedate_to_datetime(header)
+    # updated_at is naive UTC; the header is the same instant, truncated to seconds
+    updated_at = datetime.fromisoformat(response.json()["updated_at"]).replace(tzinfo=timezone.utc)
+    assert last_modified == updated_at.replace(microsecond=0)
+    assert abs(datetime.now(timezone.utc) - last_modified) < timedelta(minutes=1)
+    assert client.get(f"/api/notes/{note['id']}").headers["Last-Modified"] == header
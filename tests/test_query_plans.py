@@ -0,0 +1,221 @@
+"""Every query the repository and services run must be answerable without a sequential scan.
+
+Each case runs its code path against a seeded database, captures the SQL it
+sent and EXPLAINs every statement with seq scans disabled: Postgres then
+only picks one when no index can serve the query. Needs TEST_DATABASE_URL.
+"""
+import json
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import event, insert, select, text
+
+from src.database.db import SessionLocal, engine
+from src.database.models import Job, Note, User, UserSession
+from src.repository import counters as repository_counters
+from src.repository import notes as repository_notes
+from src.repository import users as repository_users
+from src.schemas import NotePatchSchema, NoteSchema
+from src.services import sessions
+from src.services.jobs import DEAD, job_queue, requeue_dead_jobs
+from tests.conftest import TABLES
+
+USERS = 20
+NOTES_PER_USER = 500
+TAGS = [f"tag{i}" for i in range(10)]
+WORDS = ["alpha", "bravo", "charlie", "delta", "echo", "foxtrot", "golf", "hotel"]
+
+
+@pytest.fixture(scope="module")
+def seeded(migrated_database, run):
+    """Truncate and fill the database; returns the first user."""
+
+    async def seed():
+        async with SessionLocal() as db:
+            await db.execute(text(f"TRUNCATE {', '.join(TABLES)} RESTART IDENTITY CASCADE"))
+            users = (await db.execute(
+                insert(User)
+                .values([{"email": f"user{i}@example.com", "password": "x"} for i in range(USERS)])
+                .returning(User)
+            )).scalars().all()
+            await db.commit()
+
+            for user in users:
+                notes = [
+                    NoteSchema(
+                        title=f"{WORDS[i % len(WORDS)]} {i}",
+                        content=f"{WORDS[(i * 3) % len(WORDS)]} note number {i} of {user.email}",
+                        tag=TAGS[i % len(TAGS)],
+                    )
+                    for i in range(NOTES_PER_USER)
+                ]
+                await repository_notes.import_notes(notes, user, db)
+                # leave tombstones for the changes feed
+                note_ids = (await db.execute(select(Note.id).where(Note.user_id == user.id).limit(5))).scalars()
+                for note_id in note_ids.all():
+                    await repository_notes.remove_note(note_id, user, db)
+
+            now = datetime.now()
+            await db.execute(insert(Job), [
+                {"kind": "set_gravatar", "payload": {}, "max_attempts": 3,
+                 "status": DEAD if i % 10 == 0 else "pending", "run_at": now + timedelta(hours=i % 50)}
+                for i in range(5000)
+            ])
+            await db.execute(insert(UserSession), [
+                {"id": f"{i:064x}", "user_id": users[i % USERS].id, "token_hash": f"{i:064x}",
+                 "expires_at": now + timedelta(days=i % 30 - 2)}
+                for i in range(5000)
+            ])
+            await db.commit()
+            await db.execute(text("ANALYZE"))
+            return users[0]
+
+    return run(seed())
+
+
+def seq_scans(plan):
+    """Names of app tables read by Seq Scan nodes anywhere in `plan`."""
+    found = []
+    if plan.get("Node Type") == "Seq Scan" and plan.get("Relation Name") in TABLES:
+        found.append(plan["Relation Name"])
+    for child in plan.get("Plans", []):
+        found.extend(seq_scans(child))
+    return found
+
+
+def assert_no_seq_scans(run, action):
+    """Run `action(db)` and EXPLAIN each statement it executed."""
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        # batched inserts are planned like their single-row form, which they all touch anyway
+        if not executemany:
+            statements.append((statement, parameters))
+
+    async def explain():
+        event.listen(engine.sync_engine, "before_cursor_execute", capture)
+        try:
+            async with SessionLocal() as db:
+                await action(db)
+        finally:
+            event.remove(engine.sync_engine, "before_cursor_execute", capture)
+
+        problems = []
+        async with engine.connect() as conn:
+            await conn.exec_driver_sql("SET enable_seqscan = off")
+            for statement, parameters in statements:
+                result = await conn.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {statement}", parameters)
+                plan = result.scalar_one()
+                plan = json.loads(plan) if isinstance(plan, str) else plan
+                if tables := seq_scans(plan[0]["Plan"]):
+                    problems.append(f"{', '.join(tables)}: {statement}")
+            await conn.rollback()
+        return problems
+
+    problems = run(explain())
+    assert statements, "the action ran no statements"
+    assert not problems, "sequential scans:\n" + "\n".join(problems)
+
+
+@pytest.mark.parametrize(
+    "kwargs",
+    [
+        {"page": 1},
+        {"page": 40},
+        {"page": 1, "tag": "tag3"},
+        {"page": 1, "search": "charlie", "search_mode": "substring"},
+        {"page": 1, "search": "charlie note", "search_mode": "fulltext"},
+        {"page": 2, "search": "char", "search_mode": "prefix"},
+    ],
+    ids=["first", "deep", "tag", "substring", "fulltext", "prefix"],
+)
+def test_notes_page(seeded, run, kwargs):
+    async def action(db):
+        await repository_notes.get_notes_page(db, seeded, per_page=10, **kwargs)
+
+    assert_no_seq_scans(run, action)
+
+
+@pytest.mark.parametrize("direction", ["next", "prev"])
+@pytest.mark.parametrize("tag", [None, "tag3"])
+def test_notes_by_cursor(seeded, run, direction, tag):
+    async def action(db):
+        rows, _ = await repository_notes.get_notes_page(db, seeded, page=5, per_page=10)
+        cursor = repository_notes.encode_cursor(rows[0], direction)
+        await repository_notes.get_notes_by_cursor(db, seeded, 10, cursor, tag=tag)
+
+    assert_no_seq_scans(run, action)
+
+
+@pytest.mark.parametrize("search", ["", "echo"])
+def test_tag_counts(seeded, run, search):
+    async def action(db):
+        await repository_notes.get_tag_counts(db, seeded, search)
+
+    assert_no_seq_scans(run, action)
+
+
+@pytest.mark.parametrize("since", [None, "last"])
+def test_changes(seeded, run, since):
+    async def action(db):
+        token = None
+        if since:
+            token = repository_notes.encode_change_token(await repository_counters.get_notes_version(db, seeded.id) - 1)
+        await repository_notes.get_changes(db, seeded, token, 100)
+
+    assert_no_seq_scans(run, action)
+
+
+def test_stream_notes(seeded, run):
+    async def action(db):
+        async for _ in repository_notes.stream_notes(db, seeded, batch_size=100):
+            pass
+
+    assert_no_seq_scans(run, action)
+
+
+def test_note_writes(seeded, run):
+    async def action(db):
+        note = await repository_notes.create_note(NoteSchema(title="new", content="new note", tag="tag1"), seeded, db)
+        await repository_notes.get_note(note.id, seeded, db)
+        await repository_notes.update_note(note.id, NotePatchSchema(title="renamed", tag="tag2"), seeded, db)
+        await repository_notes.remove_note(note.id, seeded, db)
+
+    assert_no_seq_scans(run, action)
+
+
+def test_apply_batch(seeded, run):
+    async def action(db):
+        created, _ = await repository_notes.apply_batch(
+            [NoteSchema(title="batch", content="batch note", tag=tag) for tag in ("tag1", "fresh")], [], seeded, db
+        )
+        await repository_notes.apply_batch([], [note.id for note in created], seeded, db)
+
+    assert_no_seq_scans(run, action)
+
+
+def test_user_by_email(seeded, run):
+    async def action(db):
+        await repository_users.get_user_by_email(seeded.email, db)
+
+    assert_no_seq_scans(run, action)
+
+
+def test_sessions(seeded, run):
+    store = sessions.DatabaseSessionStore()
+
+    async def action(db):
+        sid, jti = await store.create(db, seeded.id, "test", 3600)
+        await store.rotate(db, sid, jti, 3600)
+        await store.revoke(db, sid)
+        await sessions.delete_expired_sessions(db)
+
+    assert_no_seq_scans(run, action)
+
+
+def test_jobs(seeded, run):
+    async def action(db):
+        await job_queue._claim(5)
+        await requeue_dead_jobs(db, "set_gravatar")
+
+    assert_no_seq_scans(run, action)
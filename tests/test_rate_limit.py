@@ -0,0 +1,130 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from fastapi import Depends, FastAPI
+from fastapi.testclient import TestClient
+from pydantic import BaseModel
+
+from src.conf.config import config
+from src.services import lru, rate_limit
+from src.services.rate_limit import AuthRateLimit, MemoryBucketStore, RedisBucketStore
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = SimpleNamespace(now=1000.0)
+    fake_time = SimpleNamespace(monotonic=lambda: clock.now)
+    monkeypatch.setattr(rate_limit, "time", fake_time)
+    monkeypatch.setattr(lru, "time", fake_time)
+    return clock
+
+
+def take(store: MemoryBucketStore, key: str, burst: int = 3, rate: float = 1.0) -> float:
+    return asyncio.run(store.take(key, burst, rate))
+
+
+def test_burst_then_refill(clock):
+    store = MemoryBucketStore(100)
+    assert [take(store, "a") for _ in range(3)] == [0, 0, 0]
+    assert take(store, "a") == pytest.approx(1.0)
+    # the refused attempt took nothing
+    clock.now += 0.5
+    assert take(store, "a") == pytest.approx(0.5)
+    clock.now += 0.5
+    assert take(store, "a") == 0
+    assert take(store, "b") == 0
+
+
+def test_refill_is_capped_at_burst(clock):
+    store = MemoryBucketStore(100)
+    take(store, "a")
+    clock.now += 60
+    assert [take(store, "a") for _ in range(3)] == [0, 0, 0]
+    assert take(store, "a") > 0
+
+
+def test_idle_bucket_expires(clock):
+    store = MemoryBucketStore(100)
+    for _ in range(3):
+        take(store, "a")
+    # empty buckets refill in burst / rate seconds, after which they are dropped
+    clock.now += 3.1
+    assert store._buckets.get("a") is None
+    assert take(store, "a") == 0
+
+
+def test_redis_script_matches_memory_store(clock, fake_redis):
+    """Same takes against both stores; Redis keeps its own clock, so waits move its buckets' updated time back."""
+    memory = MemoryBucketStore(100)
+    redis_store = RedisBucketStore("localhost", 6379, None)
+
+    async def advance_redis(seconds):
+        for key in await fake_redis.keys(redis_store.prefix + "*"):
+            await fake_redis.hincrbyfloat(key, "updated", -seconds)
+
+    async def advance_memory(seconds):
+        clock.now += seconds
+
+    async def scenario(store, advance):
+        results = [await store.take("a", 3, 0.1) for _ in range(4)]
+        await advance(5)
+        results += [await store.take("a", 3, 0.1), await store.take("b", 3, 0.1)]
+        await advance(6)
+        results += [await store.take("a", 3, 0.1) for _ in range(2)]
+        await advance(100)
+        results += [await store.take("a", 3, 0.1) for _ in range(4)]
+        return results
+
+    expected = asyncio.run(scenario(memory, advance_memory))
+    assert expected == pytest.approx([0, 0, 0, 10, 5, 0, 0, 9, 0, 0, 0, 10])
+    assert asyncio.run(scenario(redis_store, advance_redis)) == pytest.approx(expected, abs=0.1)
+    # an untouched bucket expires once it would be full again
+    assert 0 < asyncio.run(fake_redis.pttl(redis_store.prefix + "b")) <= 30_000
+
+
+class Credentials(BaseModel):
+    email: str
+    password: str
+
+
+@pytest.fixture
+def client(monkeypatch, clock):
+    monkeypatch.setattr(rate_limit, "bucket_store", MemoryBucketStore(100))
+    monkeypatch.setattr(config, "AUTH_RATE_IP_BURST", 5)
+    monkeypatch.setattr(config, "AUTH_RATE_IP_PER_MINUTE", 60.0)
+    monkeypatch.setattr(config, "AUTH_RATE_EMAIL_BURST", 2)
+    monkeypatch.setattr(config, "AUTH_RATE_EMAIL_PER_MINUTE", 6.0)
+    app = FastAPI()
+
+    @app.post("/login", dependencies=[Depends(AuthRateLimit("login"))])
+    async def login(body: Credentials):
+        return {"email": body.email}
+
+    return TestClient(app)
+
+
+def test_email_limit(client):
+    credentials = {"email": "Someone@example.com", "password": "secret"}
+    assert [client.post("/login", json=credentials).status_code for _ in range(2)] == [200, 200]
+    # emails are compared case-insensitively
+    response = client.post("/login", json={**credentials, "email": " someone@EXAMPLE.com"})
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "10"
+    assert client.post("/login", json={**credentials, "email": "other@example.com"}).status_code == 200
+
+
+def test_ip_limit(client, clock):
+    statuses = [
+        client.post("/login", json={"email": f"user{i}@example.com", "password": "secret"}).status_code
+        for i in range(6)
+    ]
+    assert statuses == [200] * 5 + [429]
+    clock.now += 1
+    assert client.post("/login", json={"email": "late@example.com", "password": "secret"}).status_code == 200
+
+
+@pytest.mark.parametrize("body", [b"", b"not json", b"[1, 2]"])
+def test_malformed_body_is_left_to_validation(client, body):
+    response = client.post("/login", content=body, headers={"Content-Type": "application/json"})
+    assert response.status_code == 422
@@ -0,0 +1,48 @@
+import asyncio
+import time
+
+from sqlalchemy import text
+
+from src.database import replicas
+from src.database.replicas import ReplicaRouter, read_session
+
+UNREACHABLE = "postgresql+asyncpg://postgres@127.0.0.1:1/notes"
+
+
+def route(monkeypatch, sqlite_database, urls):
+    """Serve the primary from sqlite_database and return the router for `urls`."""
+    router = ReplicaRouter(urls, sticky_seconds=5, retry_after=30)
+    monkeypatch.setattr(replicas, "replica_router", router)
+    monkeypatch.setattr(replicas, "SessionLocal", sqlite_database)
+    return router
+
+
+async def served_by(primary: bool = False) -> str:
+    async with read_session(primary) as session:
+        await session.execute(text("SELECT 1"))
+        return session.get_bind().url.database
+
+
+def test_unreachable_replica_falls_back_to_the_primary(monkeypatch, sqlite_database):
+    router = route(monkeypatch, sqlite_database, [UNREACHABLE])
+
+    async def main():
+        assert (await served_by()).endswith("notes.db")
+        assert router.pick() is None
+        assert router._down_until[0] > time.monotonic() + 25
+        await asyncio.gather(*(engine.dispose() for engine in router.engines))
+
+    asyncio.run(main())
+
+
+def test_reads_skip_the_unreachable_replica(monkeypatch, sqlite_database, tmp_path):
+    replica = f"sqlite+aiosqlite:///{tmp_path / 'replica.db'}"
+    router = route(monkeypatch, sqlite_database, [UNREACHABLE, replica])
+
+    async def main():
+        assert [(await served_by()).endswith("replica.db") for _ in range(3)] == [True] * 3
+        assert (await served_by(primary=True)).endswith("notes.db")
+        assert router._down_until[0] > time.monotonic() and router._down_until[1] == 0
+        await asyncio.gather(*(engine.dispose() for engine in router.engines))
+
+    asyncio.run(main())
@@ -0,0 +1,25 @@
+import asyncio
+from types import SimpleNamespace
+
+from src.services import lru
+from src.services.response_cache import MemoryResponseCache
+
+
+def test_memory_response_cache(monkeypatch):
+    clock = SimpleNamespace(now=0.0)
+    monkeypatch.setattr(lru, "time", SimpleNamespace(monotonic=lambda: clock.now))
+    cache = MemoryResponseCache(max_entries=10, max_bytes=8, ttl=30)
+
+    async def main():
+        await cache.set("page:1", b"12345")
+        assert await cache.get("page:1") == b"12345"
+        # too big to fit next to page:1, so page:1 goes
+        await cache.set("page:2", b"12345")
+        assert await cache.get("page:1") is None
+        await cache.set("page:3", b"123456789")
+        assert await cache.get("page:3") is None
+        clock.now += 31
+        assert await cache.get("page:2") is None
+
+    asyncio.run(main())
+    assert cache.stats() == {"size": 0, "maxSize": 10, "hits": 1, "misses": 3, "bytes": 0, "maxBytes": 8}
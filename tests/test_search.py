@@ -0,0 +1,89 @@
+import pytest
+from sqlalchemy import insert
+
+from src.database.models import User
+from src.repository import notes as repository_notes
+from src.schemas import NoteSchema
+
+NOTES = [
+    ("alpha bravo", "first note", "work"),
+    ("alpha", "charlie delta", "home"),
+    ("100% done", "progress", "work"),
+    ("snake_case name", "variables", "home"),
+    ("alphabet", "letters", "work"),
+]
+ALL = sorted(title for title, _, _ in NOTES)
+
+
+@pytest.fixture
+def user(any_database, run):
+    async def seed():
+        async with any_database() as db:
+            user = (await db.execute(
+                insert(User).values(email="search@example.com", password="x").returning(User)
+            )).scalar_one()
+            await db.commit()
+            for title, content, tag in NOTES:
+                await repository_notes.create_note(NoteSchema(title=title, content=content, tag=tag), user, db)
+            return user
+
+    return run(seed())
+
+
+@pytest.mark.parametrize(
+    "search, search_mode, titles",
+    [
+        ("", "substring", ALL),
+        ("ALPH", "substring", ["alpha", "alpha bravo", "alphabet"]),
+        ("delta", "substring", ["alpha"]),
+        # LIKE wildcards are matched literally
+        ("%", "substring", ["100% done"]),
+        ("e_c", "substring", ["snake_case name"]),
+        ("charlie", "fulltext", ["alpha"]),
+        ("first bravo", "fulltext", ["alpha bravo"]),
+        ("alph", "prefix", ["alpha", "alpha bravo", "alphabet"]),
+        ("alph no", "prefix", ["alpha bravo"]),
+        # no search terms at all: nothing to filter on
+        ("%% !", "fulltext", ALL),
+        ("-", "prefix", ALL),
+    ],
+)
+def test_search_modes(any_database, run, user, search, search_mode, titles):
+    async def main():
+        async with any_database() as db:
+            rows, total_pages = await repository_notes.get_notes_page(
+                db, user, page=1, per_page=2, search=search, search_mode=search_mode
+            )
+            assert total_pages == (len(titles) + 1) // 2
+            assert len(rows) == min(2, len(titles))
+            rows, _ = await repository_notes.get_notes_page(
+                db, user, page=1, per_page=10, search=search, search_mode=search_mode
+            )
+            assert sorted(row.title for row in rows) == titles
+
+            counts = await repository_notes.get_tag_counts(db, user, search, search_mode)
+            expected = {}
+            for title, _, tag in NOTES:
+                if title in titles:
+                    expected[tag] = expected.get(tag, 0) + 1
+            assert counts == sorted(expected.items())
+
+    run(main())
+
+
+def test_fulltext_ranks_on_postgresql(any_database, run, user):
+    async def main():
+        async with any_database() as db:
+            ranked = repository_notes.is_ranked(db, "alpha", "fulltext")
+            assert ranked == (db.get_bind().dialect.name == "postgresql")
+            assert not repository_notes.is_ranked(db, "alpha", "substring")
+            assert not repository_notes.is_ranked(db, "%%", "fulltext")
+            if ranked:
+                # "alpha" twice in title and content ranks above a single match
+                await repository_notes.create_note(NoteSchema(title="alpha", content="alpha", tag="t"), user, db)
+                rows, _ = await repository_notes.get_notes_page(
+                    db, user, page=1, per_page=10, search="alpha", search_mode="fulltext"
+                )
+                assert (rows[0].title, rows[0].content) == ("alpha", "alpha")
+
+    run(main())
@@ -0,0 +1,55 @@
+"""Notes pages per second: response_model validation and encoding against dumps on the selected rows.
+
+Run with -s to see the numbers.
+"""
+import json
+import time
+from collections import namedtuple
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from src.schemas import NotesPageSchema
+from src.services.serialization import dumps
+
+pytestmark = pytest.mark.benchmark
+
+SECONDS = 0.5
+PER_PAGE = 100
+# what the list queries return, see NOTE_COLUMNS
+NoteRow = namedtuple("NoteRow", "id title content tag created_at updated_at version")
+
+
+def rows_per_second(serialize, page) -> float:
+    calls = 0
+    start = time.perf_counter()
+    while (elapsed := time.perf_counter() - start) < SECONDS:
+        serialize(page)
+        calls += 1
+    return calls * PER_PAGE / elapsed
+
+
+def test_dumps_on_rows_is_faster():
+    now = datetime(2026, 10, 18, 12, 0, 0)
+    rows = [
+        NoteRow(i, f"title {i}", f"content of note {i}", f"tag{i % 5}", now - timedelta(minutes=i), now, 1)
+        for i in range(PER_PAGE)
+    ]
+    # the ORM path validated Note objects through their attributes
+    notes = [SimpleNamespace(**row._asdict()) for row in rows]
+
+    def with_schema(notes):
+        page = NotesPageSchema.model_validate({"notes": notes, "totalPages": 1})
+        return JSONResponse(jsonable_encoder(page)).body
+
+    def with_dumps(rows):
+        return dumps({"notes": [row._asdict() for row in rows], "totalPages": 1, "nextCursor": None, "prevCursor": None})
+
+    assert json.loads(with_schema(notes)) == json.loads(with_dumps(rows))
+    schema_rate = rows_per_second(with_schema, notes)
+    dumps_rate = rows_per_second(with_dumps, rows)
+    print(f"\n{schema_rate:,.0f} rows/s through the schema, {dumps_rate:,.0f} rows/s with dumps")
+    assert dumps_rate > schema_rate
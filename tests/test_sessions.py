@@ -0,0 +1,105 @@
+import asyncio
+from datetime import timedelta
+
+from sqlalchemy import func, insert, select, update
+
+from src.database.models import User, UserSession
+from src.services.sessions import DatabaseSessionStore, RedisSessionStore, _digest, delete_expired_sessions
+
+TTL = 3600
+
+
+async def make_user(database) -> int:
+    async with database() as db:
+        user_id = (await db.execute(
+            insert(User).values(email="session@example.com", password="x").returning(User.id)
+        )).scalar_one()
+        await db.commit()
+        return user_id
+
+
+def test_rotation_replaces_the_token(database, run):
+    store = DatabaseSessionStore()
+
+    async def main():
+        user_id = await make_user(database)
+        async with database() as db:
+            sid, jti = await store.create(db, user_id, "laptop", TTL)
+            stored = (await db.execute(select(UserSession))).scalar_one()
+            # only digests are stored
+            assert sid not in stored.id and jti not in stored.token_hash
+            assert (stored.user_id, stored.device) == (user_id, "laptop")
+
+            new_jti = await store.rotate(db, sid, jti, TTL)
+            assert new_jti is not None and new_jti != jti
+            # the old token is spent: a replay fails and the current one still works
+            assert await store.rotate(db, sid, jti, TTL) is None
+            assert await store.rotate(db, sid, new_jti, TTL) is not None
+            assert await store.rotate(db, "unknown", new_jti, TTL) is None
+
+    run(main())
+
+
+def test_revoke(database, run):
+    store = DatabaseSessionStore()
+
+    async def main():
+        user_id = await make_user(database)
+        async with database() as db:
+            sid, jti = await store.create(db, user_id, None, TTL)
+            other_sid, other_jti = await store.create(db, user_id, None, TTL)
+            await store.revoke(db, sid)
+            assert await store.rotate(db, sid, jti, TTL) is None
+            assert await store.rotate(db, other_sid, other_jti, TTL) is not None
+
+    run(main())
+
+
+def test_expired_sessions(database, run):
+    store = DatabaseSessionStore()
+
+    async def main():
+        user_id = await make_user(database)
+        async with database() as db:
+            expired = [await store.create(db, user_id, None, TTL) for _ in range(5)]
+            live_sid, live_jti = await store.create(db, user_id, None, TTL)
+            await db.execute(
+                update(UserSession)
+                .where(UserSession.id != _digest(live_sid))
+                .values(expires_at=func.now() - timedelta(seconds=1))
+            )
+            await db.commit()
+
+            sid, jti = expired[0]
+            assert await store.rotate(db, sid, jti, TTL) is None
+            assert await delete_expired_sessions(db, batch_size=2) == 5
+            assert (await db.execute(select(func.count()).select_from(UserSession))).scalar_one() == 1
+            assert await store.rotate(db, live_sid, live_jti, TTL) is not None
+
+    run(main())
+
+
+
+def test_redis_rotation_and_revoke(fake_redis):
+    store = RedisSessionStore("localhost", 6379, None)
+
+    async def main():
+        sid, jti = await store.create(None, 7, "phone", TTL)
+        key = store.prefix + _digest(sid)
+        assert await fake_redis.hgetall(key) == {
+            b"user_id": b"7", b"token_hash": _digest(jti).encode(), b"device": b"phone"
+        }
+        assert 0 < await fake_redis.pttl(key) <= TTL * 1000
+
+        new_jti = await store.rotate(None, sid, jti, TTL * 2)
+        assert new_jti is not None and new_jti != jti
+        assert TTL * 1000 < await fake_redis.pttl(key) <= TTL * 2000
+        # replaying the spent token fails and leaves the session alone
+        assert await store.rotate(None, sid, jti, TTL) is None
+        assert await store.rotate(None, "unknown", new_jti, TTL) is None
+
+        await store.revoke(None, sid)
+        assert await store.rotate(None, sid, new_jti, TTL) is None
+        assert await fake_redis.exists(key) == 0
+
+    asyncio.run(main())
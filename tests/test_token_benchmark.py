@@ -0,0 +1,50 @@
+"""Access-token checks per second: a signature check every time against the cache in Auth._verify.
+
+Run with -s to see the numbers.
+"""
+import asyncio
+import time
+
+import pytest
+
+# imported by src.services.auth, which it imports in turn; load it first as the app does
+import src.repository.users  # noqa: F401
+from src.services.auth import auth_service
+from src.services.jwt_backend import JWT_BACKENDS
+
+pytestmark = pytest.mark.benchmark
+
+SECONDS = 0.5
+
+
+async def per_second(decode, token: str) -> float:
+    calls = 0
+    start = time.perf_counter()
+    while (elapsed := time.perf_counter() - start) < SECONDS:
+        for _ in range(100):
+            await decode(token)
+        calls += 100
+    return calls / elapsed
+
+
+@pytest.mark.parametrize("name", sorted(JWT_BACKENDS))
+def test_cached_decode_is_faster(name, monkeypatch):
+    try:
+        backend = JWT_BACKENDS[name]()
+    except ImportError:
+        pytest.skip(f"the {name} backend isn't installed")
+    monkeypatch.setattr(auth_service, "backend", backend)
+    auth_service.token_cache.clear()
+    token = auth_service._encode({"sub": "bench@example.com"}, 15 * 60, "access_token")
+
+    async def uncached(token):
+        return backend.decode(token, auth_service.SECRET_KEY, auth_service.ALGORITHM)["sub"]
+
+    async def cached(token):
+        return await auth_service.decode_token(token)
+
+    assert asyncio.run(uncached(token)) == asyncio.run(cached(token)) == "bench@example.com"
+    backend_rate = asyncio.run(per_second(uncached, token))
+    cached_rate = asyncio.run(per_second(cached, token))
+    print(f"\n{name}: {backend_rate:,.0f} tokens/s decoded, {cached_rate:,.0f} tokens/s cached")
+    assert cached_rate > backend_rate